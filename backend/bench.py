@@ -0,0 +1,536 @@
+"""Offline throughput benchmark for the research pipelines.
+
+Usage:
+    python -m backend.bench --companies 40 --concurrency 5 --mode research
+    python -m backend.bench --fixtures bench.json --mode stream --throttle-rate 0.05
+    python -m backend.bench --record bench.json --companies-file leads.txt   # real APIs, saves fixtures
+
+Tavily and Azure are replaced by in-process fakes that replay recorded responses from a
+fixture file (and synthesize deterministic ones for anything not recorded) with injected
+latency, transient errors and 429s, so throughput work can be measured without network or
+API quota. The report gives companies/minute, p50/p95 latency per company and the API
+calls, tokens and retries per company.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import httpx
+import openai
+
+from backend.cache import normalize_query
+from backend.budget import Budget
+from backend.context import count_tokens
+from backend.graph import AzureOpenAIProvider, enrich_cell_with_graph
+from backend.metrics import company_summary, new_summary
+from backend.ratelimit import RateLimiter
+from backend.researcher import ENRICHMENT_SCHEMA, ResearchPipeline
+from backend.search import SearchProvider
+
+logger = logging.getLogger(__name__)
+
+MODES = ("research", "stream", "graph")
+BENCH_DEPLOYMENT = "bench"
+
+EXTRACTION_FIELDS_PATTERN = re.compile(r"Fields to find:\s*(\{.*?\})\s*Instructions:", re.S)
+QUERY_COMPANY_PATTERN = re.compile(r"Target Company:\s*(.+)")
+QUERY_GROUPS_PATTERN = re.compile(r"Missing fields by group:\s*(\{.*\})")
+EXTRACTION_COMPANY_PATTERN = re.compile(r"Company:\s*(.+)")
+BATCH_COMPANY_PATTERN = re.compile(r"### Company:\s*(.+)\nFields to find:\s*(.+)")
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+@dataclass
+class FaultProfile:
+    """Latency and failures injected into every fake API call."""
+
+    latency: float = 0.0
+    jitter: float = 0.5
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+
+    def delay(self, rng: random.Random) -> float:
+        return max(0.0, self.latency * (1 + rng.uniform(-self.jitter, self.jitter)))
+
+    def failure(self, rng: random.Random, api: str) -> Optional[Exception]:
+        """An exception shaped like the real client's, or None when the call should succeed."""
+        roll = rng.random()
+        if roll < self.throttle_rate:
+            response = _http_response(api, 429, {"retry-after": f"{self.retry_after:g}"})
+            if api == "azure":
+                return openai.RateLimitError("Rate limit exceeded (injected)", response=response, body=None)
+            return httpx.HTTPStatusError("Too Many Requests (injected)", request=response.request, response=response)
+        if roll < self.throttle_rate + self.error_rate:
+            response = _http_response(api, 503, {})
+            if api == "azure":
+                return openai.InternalServerError("Service unavailable (injected)", response=response, body=None)
+            return httpx.HTTPStatusError("Service Unavailable (injected)", request=response.request, response=response)
+        return None
+
+
+def _http_response(api: str, status: int, headers: Dict[str, str]) -> httpx.Response:
+    url = "https://bench.invalid/openai" if api == "azure" else "https://bench.invalid/search"
+    return httpx.Response(status, headers=headers, request=httpx.Request("POST", url))
+
+
+@dataclass
+class Fixtures:
+    """Recorded Tavily results (by normalized query) and Azure completions (by prompt hash)."""
+
+    companies: List[str] = field(default_factory=list)
+    searches: Dict[str, Dict] = field(default_factory=dict)
+    completions: Dict[str, str] = field(default_factory=dict)
+    # Lookups served from the recording vs. synthesized because nothing was recorded
+    replayed: int = 0
+    synthesized: int = 0
+
+    @classmethod
+    def load(cls, path: str) -> "Fixtures":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            companies=list(data.get("companies", [])),
+            searches=dict(data.get("searches", {})),
+            completions=dict(data.get("completions", {})),
+        )
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"companies": self.companies, "searches": self.searches, "completions": self.completions},
+                f,
+                ensure_ascii=False,
+                indent=1,
+            )
+
+    def search(self, query: str, seed: int) -> Dict:
+        recorded = self.searches.get(normalize_query(query))
+        if recorded is not None:
+            self.replayed += 1
+            return recorded
+        self.synthesized += 1
+        return synthetic_search(query, seed)
+
+    def completion(self, prompt: str, seed: int, fill_rate: float) -> str:
+        recorded = self.completions.get(prompt_key(prompt))
+        if recorded is not None:
+            self.replayed += 1
+            return recorded
+        self.synthesized += 1
+        return synthetic_completion(prompt, seed, fill_rate)
+
+
+def synthetic_search(query: str, seed: int) -> Dict:
+    rng = random.Random(f"{seed}:search:{normalize_query(query)}")
+    slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")[:40] or "company"
+    results = [
+        {
+            "url": f"https://{slug}.example.id/{i}",
+            "title": f"{query} ({i})",
+            "content": f"{query}. Informasi perusahaan, produk, kantor dan manajemen. " * rng.randint(2, 6),
+            "score": round(rng.uniform(0.3, 0.9), 2),
+        }
+        for i in range(rng.randint(2, 3))
+    ]
+    return {"query": query, "answer": None, "results": results}
+
+
+def synthetic_completion(prompt: str, seed: int, fill_rate: float) -> str:
+    """A plausible answer to the pipeline's query and extraction prompts."""
+    rng = random.Random(f"{seed}:completion:{prompt_key(prompt)}")
+
+    def answer(company: str, fields: List[str]) -> Dict[str, Dict[str, str]]:
+        # Only some fields are found per round, so runs take several rounds like real ones
+        return {
+            name: {"value": f"{name} {company}", "confidence": "High"}
+            if rng.random() < fill_rate else {"value": "Tidak Tersedia", "confidence": "Low"}
+            for name in fields
+        }
+
+    batch = BATCH_COMPANY_PATTERN.findall(prompt)
+    if batch:
+        return json.dumps({
+            company.strip(): answer(company.strip(), [name.strip() for name in names.split(",")])
+            for company, names in batch
+        })
+    fields_match = EXTRACTION_FIELDS_PATTERN.search(prompt)
+    if fields_match:
+        company_match = EXTRACTION_COMPANY_PATTERN.search(prompt)
+        company = company_match.group(1).strip() if company_match else "Perusahaan"
+        try:
+            fields = json.loads(fields_match.group(1))
+        except ValueError:
+            fields = {}
+        return json.dumps(answer(company, list(fields)))
+    company_match = QUERY_COMPANY_PATTERN.search(prompt)
+    if company_match:
+        company = company_match.group(1).strip()
+        groups_found = QUERY_GROUPS_PATTERN.search(prompt)
+        try:
+            groups = json.loads(groups_found.group(1)) if groups_found else {}
+        except ValueError:
+            groups = {}
+        return json.dumps({group: [f"{company} {name}".strip() for name in fields] for group, fields in groups.items()})
+    return "{}"
+
+
+class FakeSearchProvider(SearchProvider):
+    """Tavily stand-in serving fixtures after an injected delay (or failure)."""
+
+    def __init__(self, fixtures: Fixtures, faults: FaultProfile, seed: int = 0):
+        self.fixtures = fixtures
+        self.faults = faults
+        self.seed = seed
+        self.rng = random.Random(f"{seed}:search-faults")
+        self.calls = 0
+
+    async def search(self, query: str, **params: Any) -> Dict:
+        self.calls += 1
+        await asyncio.sleep(self.faults.delay(self.rng))
+        error = self.faults.failure(self.rng, "tavily")
+        if error is not None:
+            raise error
+        return self.fixtures.search(query, self.seed)
+
+
+class FakeCompletions:
+    def __init__(self, client: "FakeAzureClient"):
+        self.client = client
+
+    async def create(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs: Any):
+        return await self.client.create(messages[-1]["content"], stream)
+
+
+class FakeAzureClient:
+    """AsyncAzureOpenAI stand-in: `client.chat.completions.create(...)` with usage and streaming."""
+
+    def __init__(self, fixtures: Fixtures, faults: FaultProfile, seed: int = 0, fill_rate: float = 0.6):
+        self.fixtures = fixtures
+        self.faults = faults
+        self.seed = seed
+        self.fill_rate = fill_rate
+        self.rng = random.Random(f"{seed}:azure-faults")
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=FakeCompletions(self))
+
+    async def create(self, prompt: str, stream: bool):
+        self.calls += 1
+        delay = self.faults.delay(self.rng)
+        error = self.faults.failure(self.rng, "azure")
+        content = self.fixtures.completion(prompt, self.seed, self.fill_rate)
+        if stream:
+            # Time to first token, the rest arrives while the stream is read
+            await asyncio.sleep(delay / 2)
+            if error is not None:
+                raise error
+            return self._stream(content, delay / 2)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        usage = SimpleNamespace(
+            prompt_tokens=count_tokens(prompt),
+            completion_tokens=count_tokens(content),
+        )
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    async def _stream(self, content: str, duration: float, chunk_size: int = 24):
+        pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)] or [""]
+        for piece in pieces:
+            await asyncio.sleep(duration / len(pieces))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+
+class RecordingSearchProvider(SearchProvider):
+    """Wraps a real provider and keeps every result for the fixture file."""
+
+    def __init__(self, provider: SearchProvider, fixtures: Fixtures):
+        self.provider = provider
+        self.fixtures = fixtures
+
+    async def search(self, query: str, **params: Any) -> Dict:
+        result = await self.provider.search(query, **params)
+        self.fixtures.searches[normalize_query(query)] = result
+        return result
+
+    async def close(self):
+        await self.provider.close()
+
+
+class RecordingCompletions:
+    def __init__(self, completions, fixtures: Fixtures):
+        self.completions = completions
+        self.fixtures = fixtures
+
+    async def create(self, **kwargs: Any):
+        key = prompt_key(kwargs["messages"][-1]["content"])
+        response = await self.completions.create(**kwargs)
+        if not kwargs.get("stream"):
+            self.fixtures.completions[key] = response.choices[0].message.content
+            return response
+        return self._record_stream(response, key)
+
+    async def _record_stream(self, stream, key: str):
+        parts = []
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            yield chunk
+        self.fixtures.completions[key] = "".join(parts)
+
+
+class RecordingAzureClient:
+    def __init__(self, client, fixtures: Fixtures):
+        self.chat = SimpleNamespace(completions=RecordingCompletions(client.chat.completions, fixtures))
+
+
+@dataclass
+class CompanyRun:
+    company: str
+    seconds: float
+    metrics: Dict[str, Any]
+    error: str = ""
+    budget_exhausted: str = ""
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_company(mode: str, company: str, pipeline: ResearchPipeline, max_rounds: int) -> CompanyRun:
+    start = time.perf_counter()
+    summary = new_summary()
+    try:
+        if mode == "stream":
+            state = None
+            async for event in pipeline.run_research_stream(company, max_global_rounds=max_rounds):
+                if event[0] == "result":
+                    state = event[1]
+        else:
+            state = await pipeline.run_research(company, max_global_rounds=max_rounds)
+    except Exception as e:
+        logger.error(f"{company}: {e}")
+        return CompanyRun(company, time.perf_counter() - start, summary, error=str(e))
+    if state is None:
+        return CompanyRun(company, time.perf_counter() - start, summary, error="No result returned")
+    return CompanyRun(company, time.perf_counter() - start, state.metrics, budget_exhausted=state.budget_exhausted)
+
+
+async def run_benchmark(
+    companies: List[str],
+    pipeline: ResearchPipeline,
+    mode: str = "research",
+    concurrency: int = 5,
+    max_rounds: int = 3,
+) -> Dict[str, Any]:
+    """Research `companies` with `concurrency` workers and summarise throughput and cost."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for company in companies:
+        queue.put_nowait(company)
+    runs: List[CompanyRun] = []
+    # One graph provider per benchmark, so its compiled graph is reused like in the app
+    graph_provider = AzureOpenAIProvider(pipeline.client, BENCH_DEPLOYMENT, limiter=pipeline.azure_limiter)
+
+    async def worker():
+        while not queue.empty():
+            company = queue.get_nowait()
+            if mode == "graph":
+                runs.append(await run_graph_company(company, pipeline, graph_provider))
+            else:
+                runs.append(await run_company(mode, company, pipeline, max_rounds))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return build_report(mode, runs, time.perf_counter() - start, concurrency)
+
+
+async def run_graph_company(company: str, pipeline: ResearchPipeline, provider: AzureOpenAIProvider) -> CompanyRun:
+    """The per-cell path: every searchable column is its own one-round research."""
+    start = time.perf_counter()
+    summary = new_summary()
+    columns = [name for name, spec in ENRICHMENT_SCHEMA.items() if not spec.get("derived")]
+    with company_summary(summary):
+        results = await asyncio.gather(*(
+            enrich_cell_with_graph(column, company, {}, pipeline.search_provider, provider, cache=None, llm_cache=None)
+            for column in columns
+        ))
+    failed = [r for r in results if r.get("answer") == "Error during enrichment"]
+    error = f"{len(failed)} of {len(columns)} cells failed" if failed else ""
+    return CompanyRun(company, time.perf_counter() - start, summary, error=error)
+
+
+def build_report(mode: str, runs: List[CompanyRun], elapsed: float, concurrency: int) -> Dict[str, Any]:
+    latencies = [run.seconds for run in runs]
+    count = max(1, len(runs))
+
+    def per_company(key: str) -> float:
+        return round(sum(run.metrics.get(key, 0) for run in runs) / count, 2)
+
+    return {
+        "mode": mode,
+        "companies": len(runs),
+        "failed": sum(1 for run in runs if run.error),
+        "budget_exhausted": sum(1 for run in runs if run.budget_exhausted),
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 2),
+        "companies_per_minute": round(len(runs) / elapsed * 60, 2) if elapsed else 0.0,
+        "latency_p50_seconds": round(percentile(latencies, 50), 3),
+        "latency_p95_seconds": round(percentile(latencies, 95), 3),
+        "search_calls_per_company": per_company("search_calls"),
+        "llm_calls_per_company": per_company("llm_calls"),
+        "prompt_tokens_per_company": per_company("prompt_tokens"),
+        "completion_tokens_per_company": per_company("completion_tokens"),
+        "retries_per_company": per_company("retries"),
+    }
+
+
+def build_offline_pipeline(
+    fixtures: Fixtures,
+    search_faults: FaultProfile,
+    llm_faults: FaultProfile,
+    mode: str,
+    seed: int = 0,
+    fill_rate: float = 0.6,
+    concurrency: int = 5,
+    budget: Optional[Budget] = None,
+    batch_size: int = 1,
+) -> ResearchPipeline:
+    """A ResearchPipeline wired to the fakes, with caches off so every call reaches them."""
+    return ResearchPipeline(
+        FakeSearchProvider(fixtures, search_faults, seed),
+        FakeAzureClient(fixtures, llm_faults, seed, fill_rate),
+        BENCH_DEPLOYMENT,
+        tavily_concurrency=concurrency * 2,
+        azure_concurrency=concurrency,
+        cache=None,
+        llm_cache=None,
+        stream_extraction=mode == "stream",
+        batch_size=batch_size,
+        # Short backoff so injected 5xx errors do not dominate the run; 429s still honour retry-after
+        azure_limiter=RateLimiter("azure", base_delay=0.1, max_delay=5.0),
+        tavily_limiter=RateLimiter("tavily", base_delay=0.1, max_delay=5.0),
+        budget=budget,
+    )
+
+
+def load_companies(path: Optional[str], count: int, fixtures: Fixtures) -> List[str]:
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    if fixtures.companies:
+        return fixtures.companies
+    return [f"PT Benchmark Sejahtera {i:03d}" for i in range(1, count + 1)]
+
+
+def print_report(report: Dict[str, Any]):
+    width = max(len(key) for key in report)
+    for key, value in report.items():
+        print(f"{key:<{width}}  {value}")
+
+
+async def record_fixtures(companies: List[str], path: str, mode: str, max_rounds: int, concurrency: int):
+    """Run the real pipeline once and save every search result and completion to `path`."""
+    from backend.clients import build_research_pipeline, close_clients
+
+    fixtures = Fixtures(companies=companies)
+    pipeline = build_research_pipeline()
+    pipeline.search_provider = RecordingSearchProvider(pipeline.search_provider, fixtures)
+    pipeline.client = RecordingAzureClient(pipeline.client, fixtures)
+    # Bypass the caches, otherwise cached answers would never be recorded
+    pipeline.cache = None
+    pipeline.llm_cache = None
+    pipeline.stream_extraction = mode == "stream"
+    try:
+        report = await run_benchmark(companies, pipeline, "stream" if mode == "stream" else "research", concurrency, max_rounds)
+    finally:
+        await close_clients()
+    fixtures.save(path)
+    logger.info(f"Recorded {len(fixtures.searches)} searches and {len(fixtures.completions)} completions to {path}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the enrichment pipelines offline against recorded fixtures.")
+    parser.add_argument("--mode", choices=MODES, default="research", help="run_research, run_research_stream or enrich_cell_with_graph")
+    parser.add_argument("--fixtures", help="Fixture file to replay (anything not recorded is synthesized)")
+    parser.add_argument("--record", help="Run against the real APIs and save fixtures to this file")
+    parser.add_argument("--companies", type=int, default=20, help="Synthetic companies when no list or fixtures are given")
+    parser.add_argument("--companies-file", help="Text file with one company name per line")
+    parser.add_argument("--concurrency", type=int, default=5, help="Companies researched at the same time")
+    parser.add_argument("--max-rounds", type=int, default=3, help="Maximum search rounds per company")
+    parser.add_argument("--search-latency", type=float, default=0.4, help="Mean seconds per fake Tavily call")
+    parser.add_argument("--llm-latency", type=float, default=1.5, help="Mean seconds per fake Azure call")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency varies by +/- this fraction")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls failing with a 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of calls failing with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with injected 429s")
+    parser.add_argument("--fill-rate", type=float, default=0.6, help="Chance a synthesized extraction finds a field")
+    parser.add_argument("--budget-seconds", type=float, help="Per-company time budget")
+    parser.add_argument("--budget-tokens", type=int, help="Per-company LLM token budget")
+    parser.add_argument("--budget-searches", type=int, help="Per-company Tavily call budget")
+    parser.add_argument("--batch-size", type=int, default=1, help="Companies packed into one extraction call")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthesized responses and injected faults")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipelines' INFO logs")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    if not args.verbose:
+        # Per-request INFO logs would drown the report (researcher/graph set their own levels)
+        for name in ("backend", "backend.researcher", "backend.graph"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+    concurrency = max(1, args.concurrency)
+    try:
+        if args.record:
+            if args.mode == "graph":
+                raise ValueError("Recording supports the research and stream modes")
+            from dotenv import load_dotenv
+            load_dotenv()
+            companies = load_companies(args.companies_file, args.companies, Fixtures())
+            report = asyncio.run(record_fixtures(companies, args.record, args.mode, args.max_rounds, concurrency))
+        else:
+            fixtures = Fixtures.load(args.fixtures) if args.fixtures else Fixtures()
+            companies = load_companies(args.companies_file, args.companies, fixtures)
+            search_faults = FaultProfile(args.search_latency, args.jitter, args.error_rate, args.throttle_rate, args.retry_after)
+            llm_faults = FaultProfile(args.llm_latency, args.jitter, args.error_rate, args.throttle_rate, args.retry_after)
+            budget = Budget(args.budget_seconds, args.budget_tokens, args.budget_searches)
+            pipeline = build_offline_pipeline(
+                fixtures, search_faults, llm_faults, args.mode, args.seed, args.fill_rate, concurrency,
+                budget if budget.is_set() else None, max(1, args.batch_size),
+            )
+            report = asyncio.run(run_benchmark(companies, pipeline, args.mode, concurrency, args.max_rounds))
+            report["fixture_replayed"] = fixtures.replayed
+            report["fixture_synthesized"] = fixtures.synthesized
+    except (ValueError, FileNotFoundError) as e:
+        logger.error(str(e))
+        return 1
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
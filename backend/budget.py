@@ -0,0 +1,162 @@
+"""Cost and latency budgets for research runs.
+
+A Budget caps wall-clock seconds, LLM tokens and Tavily search calls. The per-company
+budget is checked against the company's metrics summary (see backend.metrics), and the
+per-job budget against the summaries of every company in the job. When one runs out, the
+round loop stops, keeps the best fields found so far and sets `budget_exhausted` on the state.
+Time budgets also bound the round in progress: its searches and extraction are cut off at
+BudgetTracker.seconds_left().
+"""
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _env_number(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        logger.warning(f"Ignoring invalid {name}={value!r}")
+        return None
+
+
+@dataclass
+class Budget:
+    """Limits for one company or one job; None means unlimited."""
+    max_seconds: Optional[float] = None
+    max_tokens: Optional[int] = None
+    max_search_calls: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, prefix: str) -> Optional["Budget"]:
+        """Read <prefix>_SECONDS, <prefix>_TOKENS and <prefix>_SEARCHES; None when none is set."""
+        seconds = _env_number(f"{prefix}_SECONDS")
+        tokens = _env_number(f"{prefix}_TOKENS")
+        searches = _env_number(f"{prefix}_SEARCHES")
+        budget = cls(
+            max_seconds=seconds,
+            max_tokens=int(tokens) if tokens is not None else None,
+            max_search_calls=int(searches) if searches is not None else None,
+        )
+        return budget if budget.is_set() else None
+
+    def is_set(self) -> bool:
+        return any(v is not None for v in (self.max_seconds, self.max_tokens, self.max_search_calls))
+
+    def exceeded(self, seconds: float, tokens: int, search_calls: int) -> Optional[str]:
+        """Why the budget is used up, or None while there is room left."""
+        if self.max_seconds is not None and seconds >= self.max_seconds:
+            return f"{seconds:.0f}s of {self.max_seconds:g}s"
+        if self.max_tokens is not None and tokens >= self.max_tokens:
+            return f"{tokens} of {self.max_tokens} tokens"
+        if self.max_search_calls is not None and search_calls >= self.max_search_calls:
+            return f"{search_calls} of {self.max_search_calls} searches"
+        return None
+
+    def searches_left(self, search_calls: int) -> Optional[int]:
+        if self.max_search_calls is None:
+            return None
+        return max(0, self.max_search_calls - search_calls)
+
+    def seconds_left(self, seconds: float) -> Optional[float]:
+        if self.max_seconds is None:
+            return None
+        return self.max_seconds - seconds
+
+
+def summary_tokens(summary: Dict[str, Any]) -> int:
+    return int(summary.get("prompt_tokens", 0) + summary.get("completion_tokens", 0))
+
+
+def summary_seconds(summary: Dict[str, Any]) -> float:
+    """Time spent in completed search rounds, including rounds from before a resume."""
+    return summary.get("stages", {}).get("round", {}).get("seconds", 0.0)
+
+
+class JobBudget:
+    """Budget shared by every company of one job; time counts from when the job (re)started."""
+
+    def __init__(self, budget: Budget):
+        self.budget = budget
+        self.started = time.monotonic()
+        self._summaries: Dict[int, Dict[str, Any]] = {}
+
+    def track(self, summary: Dict[str, Any]):
+        self._summaries[id(summary)] = summary
+
+    def exceeded(self) -> Optional[str]:
+        summaries: List[Dict[str, Any]] = list(self._summaries.values())
+        reason = self.budget.exceeded(
+            time.monotonic() - self.started,
+            sum(summary_tokens(s) for s in summaries),
+            sum(int(s.get("search_calls", 0)) for s in summaries),
+        )
+        return f"job budget: {reason}" if reason else None
+
+    def searches_left(self) -> Optional[int]:
+        return self.budget.searches_left(sum(int(s.get("search_calls", 0)) for s in self._summaries.values()))
+
+    def seconds_left(self) -> Optional[float]:
+        return self.budget.seconds_left(time.monotonic() - self.started)
+
+
+class BudgetTracker:
+    """Checks one company's run against its own budget and, optionally, its job's."""
+
+    def __init__(self, summary: Dict[str, Any], budget: Optional[Budget] = None, job: Optional[JobBudget] = None):
+        self.summary = summary
+        self.budget = budget
+        self.job = job
+        self.round_started: Optional[float] = None
+        if job is not None:
+            job.track(summary)
+
+    def start_round(self):
+        self.round_started = time.monotonic()
+
+    def end_round(self) -> float:
+        """Seconds the round took; they count through the summary's round stage from now on."""
+        seconds = self.round_seconds()
+        self.round_started = None
+        return seconds
+
+    def round_seconds(self) -> float:
+        return time.monotonic() - self.round_started if self.round_started is not None else 0.0
+
+    def seconds_spent(self) -> float:
+        """Company time: completed rounds plus the round in progress."""
+        return summary_seconds(self.summary) + self.round_seconds()
+
+    def exhausted(self) -> Optional[str]:
+        if self.budget is not None:
+            reason = self.budget.exceeded(
+                self.seconds_spent(), summary_tokens(self.summary), int(self.summary.get("search_calls", 0))
+            )
+            if reason:
+                return f"company budget: {reason}"
+        return self.job.exceeded() if self.job is not None else None
+
+    def searches_left(self) -> Optional[int]:
+        """Search calls this company may still make this round; None when unlimited."""
+        limits = []
+        if self.budget is not None:
+            limits.append(self.budget.searches_left(int(self.summary.get("search_calls", 0))))
+        if self.job is not None:
+            limits.append(self.job.searches_left())
+        limits = [limit for limit in limits if limit is not None]
+        return min(limits) if limits else None
+
+    def seconds_left(self) -> Optional[float]:
+        """Seconds until the company or job time budget runs out (<= 0 once it has); None when unlimited."""
+        limits = []
+        if self.budget is not None:
+            limits.append(self.budget.seconds_left(self.seconds_spent()))
+        if self.job is not None:
+            limits.append(self.job.seconds_left())
+        limits = [limit for limit in limits if limit is not None]
+        return min(limits) if limits else None
@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "enrichment_cache.sqlite3")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share a key."""
+    return " ".join(query.lower().split())
+
+
+class PersistentCache:
+    """SQLite-backed key-value cache with LRU eviction, per-entry TTL and a byte size limit.
+
+    One database file can hold several caches; each instance works on its own table.
+    The file is shared safely between threads and worker processes (WAL mode). Triggers
+    keep a running byte total per table, so a write only evicts (and scans) when the
+    table is over its limit. LRU access times are buffered and written in batches. Use the
+    `a*` methods from async code; they run the database work in a worker thread.
+    """
+
+    # Buffered last_access updates are written when this many are pending or this old
+    touch_batch_size = 100
+    touch_interval = 5.0
+    # Eviction trims to this fraction of max_bytes so it does not rerun on every write at the limit
+    evict_to = 0.9
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        table: str = "cache",
+        max_bytes: int = 100 * 1024 * 1024,
+        default_ttl: Optional[float] = 7 * 24 * 3600,
+    ):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._touched_since = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Open lazily so importing the module never touches the disk
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # One transaction, so concurrent processes agree on the initial total and the triggers
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_lru ON {self.table} (last_access)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_sizes (name TEXT PRIMARY KEY, bytes INTEGER NOT NULL)")
+            # Tables created before the running total existed are summed once
+            conn.execute(
+                f"INSERT OR IGNORE INTO cache_sizes (name, bytes) SELECT ?, COALESCE(SUM(size), 0) FROM {self.table}",
+                (self.table,),
+            )
+            for event, change in (
+                ("INSERT", "+ NEW.size"),
+                ("DELETE", "- OLD.size"),
+                ("UPDATE OF size", "+ NEW.size - OLD.size"),
+            ):
+                trigger = f"{self.table}_size_{event.split()[0].lower()}"
+                conn.execute(
+                    f"""CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON {self.table} BEGIN
+                        UPDATE cache_sizes SET bytes = bytes {change} WHERE name = '{self.table}';
+                    END"""
+                )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(namespace: str, query: str, **params: Any) -> str:
+        """Build a key from the normalized query plus the parameters that shape the result."""
+        payload = json.dumps(
+            {"ns": namespace, "q": normalize_query(query), "params": params},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                if row is not None:
+                    conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            self._touch(conn, key, now)
+            self.hits += 1
+        return json.loads(row[0])
+
+    def _touch(self, conn: sqlite3.Connection, key: str, now: float):
+        if not self._touched:
+            self._touched_since = now
+        self._touched[key] = now
+        if len(self._touched) >= self.touch_batch_size or now - self._touched_since >= self.touch_interval:
+            self._flush_touches(conn)
+            conn.commit()
+
+    def _flush_touches(self, conn: sqlite3.Connection):
+        if self._touched:
+            conn.executemany(
+                f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a JSON-serialisable value, evicting least recently used entries over the size limit."""
+        data = json.dumps(value)
+        size = len(data.encode())
+        if size > self.max_bytes:
+            logger.warning(f"Skipping cache entry of {size} bytes (limit {self.max_bytes})")
+            return
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            conn = self._connection()
+            # An upsert (not INSERT OR REPLACE) so the size triggers see the replaced entry
+            conn.execute(
+                f"""INSERT INTO {self.table} (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size,
+                    expires_at = excluded.expires_at, last_access = excluded.last_access""",
+                (key, data, size, expires_at, now),
+            )
+            self._touched.pop(key, None)
+            if self._total_bytes(conn) > self.max_bytes:
+                self._evict(conn, now)
+            conn.commit()
+
+    def _total_bytes(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT bytes FROM cache_sizes WHERE name = ?", (self.table,)).fetchone()
+        return row[0] if row else 0
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        # Expired entries go first, then the least recently used ones
+        self._flush_touches(conn)
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        total = self._total_bytes(conn)
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * self.evict_to)
+        freed = 0
+        stale_keys = []
+        for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access ASC"):
+            if total - freed <= target:
+                break
+            stale_keys.append((key,))
+            freed += size
+        conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", stale_keys)
+        logger.info(f"Evicted {len(stale_keys)} cache entries ({freed} bytes) from {self.table}")
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None):
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    def flush(self):
+        """Write buffered access times now (e.g. before shutdown)."""
+        with self._lock:
+            if not self._touched:
+                return
+            conn = self._connection()
+            self._flush_touches(conn)
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            self._touched.clear()
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            conn = self._connection()
+            entries = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            size = self._total_bytes(conn)
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+class SearchCache(PersistentCache):
+    """Cache of raw Tavily responses keyed on normalized query + search parameters."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, **kwargs):
+        super().__init__(path, table="search_cache", **kwargs)
+
+    def get_search(self, query: str, **params: Any) -> Optional[Dict]:
+        return self.get(self.make_key("tavily", query, **params))
+
+    def set_search(self, query: str, result: Dict, **params: Any):
+        self.set(self.make_key("tavily", query, **params), result)
+
+    async def aget_search(self, query: str, **params: Any) -> Optional[Dict]:
+        return await self.aget(self.make_key("tavily", query, **params))
+
+    async def aset_search(self, query: str, result: Dict, **params: Any):
+        await self.aset(self.make_key("tavily", query, **params), result)
+
+
+class CompletionCache(PersistentCache):
+    """Content-addressed cache of LLM completions keyed on (deployment, prompt hash, temperature)."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, **kwargs):
+        super().__init__(path, table="completion_cache", **kwargs)
+
+    @staticmethod
+    def completion_key(deployment: str, prompt: str, temperature: float) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+        return hashlib.sha256(f"{deployment}:{prompt_hash}:{temperature}".encode()).hexdigest()
+
+    def get_completion(self, deployment: str, prompt: str, temperature: float) -> Optional[str]:
+        return self.get(self.completion_key(deployment, prompt, temperature))
+
+    def set_completion(self, deployment: str, prompt: str, temperature: float, content: str):
+        self.set(self.completion_key(deployment, prompt, temperature), content)
+
+    async def aget_completion(self, deployment: str, prompt: str, temperature: float) -> Optional[str]:
+        return await self.aget(self.completion_key(deployment, prompt, temperature))
+
+    async def aset_completion(self, deployment: str, prompt: str, temperature: float, content: str):
+        await self.aset(self.completion_key(deployment, prompt, temperature), content)
+
+
+# Shared by ResearchPipeline and EnrichmentPipeline in every worker process
+search_cache = SearchCache(
+    path=os.getenv("ENRICHMENT_CACHE_PATH", DEFAULT_CACHE_PATH),
+    max_bytes=int(os.getenv("SEARCH_CACHE_MAX_BYTES", 100 * 1024 * 1024)),
+    default_ttl=float(os.getenv("SEARCH_CACHE_TTL", 7 * 24 * 3600)),
+)
+
+completion_cache = CompletionCache(
+    path=os.getenv("ENRICHMENT_CACHE_PATH", DEFAULT_CACHE_PATH),
+    max_bytes=int(os.getenv("COMPLETION_CACHE_MAX_BYTES", 50 * 1024 * 1024)),
+    default_ttl=float(os.getenv("COMPLETION_CACHE_TTL", 30 * 24 * 3600)),
+)
@@ -0,0 +1,172 @@
+"""Process-wide registry of API clients and pipelines.
+
+Clients are created once per worker process (async clients: once per event loop, since
+their httpx pools are bound to the loop) and reuse pooled keep-alive connections, so TLS
+handshakes happen once instead of on every enrichment run.
+"""
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import AsyncAzureOpenAI
+from tavily import AsyncTavilyClient
+
+from backend.budget import Budget
+from backend.cache import completion_cache, search_cache
+from backend.ratelimit import RateLimiter
+from backend.researcher import ResearchPipeline
+from backend.search import AsyncTavilySearchProvider, SearchProvider
+
+logger = logging.getLogger(__name__)
+
+# Re-entrant: get_research_pipeline builds the pipeline (and its clients) while holding it
+_lock = threading.RLock()
+# Keyed on the event loop itself, so entries go away with the loop instead of outliving it
+_search_providers: "weakref.WeakKeyDictionary[Any, SearchProvider]" = weakref.WeakKeyDictionary()
+_azure_clients: "weakref.WeakKeyDictionary[Any, AsyncAzureOpenAI]" = weakref.WeakKeyDictionary()
+_pipelines: "weakref.WeakKeyDictionary[Any, ResearchPipeline]" = weakref.WeakKeyDictionary()
+
+
+class _NoLoop:
+    """Registry key for callers outside a running event loop."""
+
+
+_NO_LOOP = _NoLoop()
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+def _require_env(*names: str) -> Dict[str, str]:
+    values = {name: os.getenv(name) for name in names}
+    missing = [name for name, value in values.items() if not value]
+    if missing:
+        raise ValueError(f"Missing environment variables: {', '.join(missing)}")
+    return {name: str(value) for name, value in values.items()}
+
+
+def _loop_key() -> Any:
+    """The running event loop, or _NO_LOOP; also drops the entries of closed loops.
+
+    A pipeline's semaphores and the clients' connection pools can hold a reference to
+    their loop, which would keep a weak key alive, so closed loops are pruned explicitly.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _NO_LOOP
+    with _lock:
+        for registry in (_search_providers, _azure_clients, _pipelines):
+            for closed in [key for key in registry if key is not _NO_LOOP and key.is_closed()]:
+                del registry[closed]
+    return loop
+
+
+def get_search_provider() -> SearchProvider:
+    """Shared async Tavily search provider for the running event loop (TAVILY_POOL_SIZE connections).
+
+    Searches run natively on the event loop, so hundreds can be in flight without
+    exhausting the default thread pool.
+    """
+    key = _loop_key()
+    with _lock:
+        if key not in _search_providers:
+            env = _require_env("TAVILY_API_KEY")
+            pool_size = env_int("TAVILY_POOL_SIZE", 20)
+            http_client = httpx.AsyncClient(
+                base_url="https://api.tavily.com",
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+            )
+            client = AsyncTavilyClient(api_key=env["TAVILY_API_KEY"], client=http_client)
+            _search_providers[key] = AsyncTavilySearchProvider(client, http_client)
+            logger.info(f"Created shared async Tavily client (pool size {pool_size})")
+        return _search_providers[key]
+
+
+def get_azure_client() -> AsyncAzureOpenAI:
+    """Shared AsyncAzureOpenAI client for the running event loop (AZURE_POOL_SIZE connections)."""
+    key = _loop_key()
+    with _lock:
+        if key not in _azure_clients:
+            env = _require_env("AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT")
+            pool_size = env_int("AZURE_POOL_SIZE", 20)
+            _azure_clients[key] = AsyncAzureOpenAI(
+                api_key=env["AZURE_OPENAI_API_KEY"],
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+                azure_endpoint=env["AZURE_OPENAI_ENDPOINT"],
+                # Retries are handled by the shared RateLimiter, which honors Retry-After across callers
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                    timeout=httpx.Timeout(120.0, connect=10.0),
+                ),
+            )
+            logger.info(f"Created shared Azure OpenAI client (pool size {pool_size})")
+        return _azure_clients[key]
+
+
+def get_deployment() -> str:
+    return _require_env("AZURE_OPENAI_DEPLOYMENT_NAME")["AZURE_OPENAI_DEPLOYMENT_NAME"]
+
+
+def build_research_pipeline(tavily_concurrency: int = 5, azure_concurrency: int = 4) -> ResearchPipeline:
+    """New ResearchPipeline on the shared clients; TAVILY_/AZURE_CONCURRENCY override the given defaults."""
+    return ResearchPipeline(
+        get_search_provider(),
+        get_azure_client(),
+        get_deployment(),
+        tavily_concurrency=env_int("TAVILY_CONCURRENCY", tavily_concurrency),
+        azure_concurrency=env_int("AZURE_CONCURRENCY", azure_concurrency),
+        search_timeout=float(os.getenv("TAVILY_SEARCH_TIMEOUT", "20")),
+        deterministic=os.getenv("LLM_DETERMINISTIC", "").lower() in ("1", "true", "yes"),
+        azure_limiter=RateLimiter(
+            "azure",
+            requests_per_minute=_env_float("AZURE_RPM"),
+            tokens_per_minute=_env_float("AZURE_TPM"),
+        ),
+        tavily_limiter=RateLimiter("tavily", requests_per_minute=_env_float("TAVILY_RPM")),
+        stream_extraction=os.getenv("LLM_STREAM_EXTRACTION", "true").lower() in ("1", "true", "yes"),
+        batch_size=env_int("EXTRACTION_BATCH_SIZE", 1),
+        batch_window=float(os.getenv("EXTRACTION_BATCH_WINDOW", "0.2")),
+        response_format=os.getenv("LLM_RESPONSE_FORMAT", "json_object"),
+        rule_extraction=os.getenv("RULE_EXTRACTION", "true").lower() in ("1", "true", "yes"),
+        budget=Budget.from_env("COMPANY_BUDGET"),
+    )
+
+
+def get_research_pipeline() -> ResearchPipeline:
+    """Shared ResearchPipeline, so its caps and rate limits apply to every job in the process."""
+    key = _loop_key()
+    with _lock:
+        if key not in _pipelines:
+            _pipelines[key] = build_research_pipeline()
+        return _pipelines[key]
+
+
+async def close_clients():
+    """Close pooled connections, e.g. on shutdown or at the end of a CLI run."""
+    key = _loop_key()
+    with _lock:
+        azure_client = _azure_clients.pop(key, None)
+        search_provider = _search_providers.pop(key, None)
+        _pipelines.pop(key, None)
+    if search_provider is not None:
+        await search_provider.close()
+    if azure_client is not None:
+        await azure_client.close()
+    for cache in (search_cache, completion_cache):
+        await asyncio.to_thread(cache.flush)
@@ -0,0 +1,136 @@
+import logging
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SNIPPET_PATTERN = re.compile(r"(?:^|\n\n)Source: (.*?)\nContent: ", re.S)
+WORD_PATTERN = re.compile(r"\w+", re.U)
+
+_encoder = None
+_encoder_loaded = False
+
+
+@dataclass
+class Snippet:
+    url: str
+    content: str
+
+    def render(self) -> str:
+        return f"Source: {self.url}\nContent: {self.content}"
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, otherwise estimate ~4 characters per token."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.info(f"tiktoken unavailable ({e}), using character-based token estimate")
+    if _encoder is not None:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in WORD_PATTERN.findall(text.lower()) if len(w) > 2]
+
+
+def parse_snippets(content: str) -> List[Snippet]:
+    """Split aggregated search content ("Source: ...\\nContent: ..." blocks) back into snippets."""
+    matches = list(SNIPPET_PATTERN.finditer(content))
+    if not matches:
+        return [Snippet(url="", content=content.strip())] if content.strip() else []
+    snippets = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        snippets.append(Snippet(url=match.group(1).strip(), content=content[match.end():end].strip()))
+    return snippets
+
+
+def dedupe_snippets(snippets: List[Snippet], threshold: float = 0.8) -> List[Snippet]:
+    """Drop repeated URLs and snippets whose word sets overlap another by `threshold` (Jaccard)."""
+    kept: List[Snippet] = []
+    kept_words: List[set] = []
+    seen_urls = set()
+    for snippet in snippets:
+        if snippet.url and snippet.url in seen_urls:
+            continue
+        words = set(tokenize(snippet.content))
+        if not words:
+            continue
+        if any(len(words & other) / len(words | other) >= threshold for other in kept_words):
+            continue
+        seen_urls.add(snippet.url)
+        kept.append(snippet)
+        kept_words.append(words)
+    return kept
+
+
+def bm25_scores(query: List[str], documents: List[List[str]], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    n = len(documents)
+    if n == 0:
+        return []
+    avg_len = sum(len(d) for d in documents) / n or 1.0
+    doc_freq = Counter(term for d in documents for term in set(d))
+    scores = []
+    for doc in documents:
+        tf = Counter(doc)
+        score = 0.0
+        for term in set(query):
+            if term not in tf:
+                continue
+            idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * len(doc) / avg_len))
+        scores.append(score)
+    return scores
+
+
+def build_context(
+    content: str,
+    field_queries: Dict[str, str],
+    token_budget: int = 3500,
+    company_name: Optional[str] = None,
+) -> str:
+    """Pack the most relevant snippets for the still-missing fields into `token_budget` tokens.
+
+    `field_queries` maps each target field to the text it is scored against (its schema
+    description). Snippets are deduplicated, ranked per field with BM25 and taken round-robin
+    across fields, so every field gets its best evidence before any field gets its second best.
+    """
+    snippets = dedupe_snippets(parse_snippets(content))
+    if not snippets:
+        return ""
+
+    documents = [tokenize(s.content) for s in snippets]
+    extra = tokenize(company_name) if company_name else []
+    rankings = []
+    for field_name, description in field_queries.items():
+        scores = bm25_scores(tokenize(f"{field_name} {description}") + extra, documents)
+        rankings.append(sorted(range(len(snippets)), key=lambda i: scores[i], reverse=True))
+    if not rankings:
+        rankings = [list(range(len(snippets)))]
+
+    selected: List[int] = []
+    chosen = set()
+    used = 0
+    for rank in range(len(snippets)):
+        for ranking in rankings:
+            index = ranking[rank]
+            if index in chosen:
+                continue
+            chosen.add(index)
+            cost = count_tokens(snippets[index].render()) + 1
+            if used + cost > token_budget:
+                continue
+            selected.append(index)
+            used += cost
+
+    # Keep the original search order so the prompt reads naturally and stays reproducible
+    return "\n\n".join(snippets[i].render() for i in sorted(selected))
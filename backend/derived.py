@@ -0,0 +1,71 @@
+"""Fields computed locally from other fields instead of being searched for.
+
+A derived field declares `derived: True` and `depends_on` in ENRICHMENT_SCHEMA. It gets
+no search queries and no extraction slot; it is recomputed after its inputs change.
+"""
+import logging
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+POLICY_ORDER = ["MV4", "TPL", "PA", "MV2", "Properti", "Travel", "Cargo"]
+
+# (word prefixes in Sektor/Short Description, policies they suggest). Prefixes are regex
+# fragments matched at a word start, so "airline" also matches "Airlines" and "transport"
+# matches "transportasi"/"transportation"
+POLICY_RULES: List[Tuple[Tuple[str, ...], List[str]]] = [
+    (("logisti", "pengiriman", "ekspedisi", "freight", "shipping", "shipment", "kurir", "courier", "transport", "truck", "angkutan", "cargo", "kargo"), ["Cargo", "MV4", "TPL"]),
+    (("travel", "tour", "wisata", "pariwisata", "perjalanan", "airline", "maskapai", "penerbangan", "aviation", "hotel", "hospitality", "resort"), ["Travel", "PA"]),
+    (("otomotif", "automotive", "rental", "sewa kendaraan", "sewa mobil", "dealer", "leasing", "fleet", "armada"), ["MV4", "TPL"]),
+    (("sepeda motor", "motorcycle", "ojek", "deliver", "pesan antar"), ["MV2", "PA"]),
+    (("ekspor", "export", r"impor(?!tan)", "trading", "trader", "perdagangan", "distribu"), ["Cargo"]),
+    (("propert", "real estate", "konstruksi", "construct", "developer", "manufaktur", "manufactur", "pabrik", "factor(?:y|ies)", "gudang", "warehous"), ["Properti"]),
+    (("tambang", "pertambangan", "mining", "minyak", r"oil\b", r"gas\b", "energ", "perkebunan", "plantation", "pertanian", "agri"), ["Properti", "PA", "MV4"]),
+    (("retail", "ritel", "supermarket", "minimarket", "department store", "toko", "e-?commerce", "marketplace"), ["Properti", "Cargo"]),
+    (("f&b", "food", "beverage", "makanan", "minuman", "restoran", "restaurant", "kuliner", "culinary", "cafe", "kafe", "catering", "katering"), ["Properti", "Cargo"]),
+    (("technolog", "teknologi", "software", "perangkat lunak", "telekomunikasi", "telecom", "internet", "data center"), ["Properti", "PA"]),
+    (("bank", "perbankan", "keuangan", "financ", "multifinance", "fintech", "asuransi", "insurance", "sekuritas", "securities"), ["Properti", "PA"]),
+    (("rumah sakit", "hospital", "klinik", "clinic", "kesehatan", "health", "medis", "medical", "farmasi", "pharma"), ["Properti", "PA"]),
+    (("pendidikan", "education", "sekolah", "school", "universita", "kampus", "campus", "kursus"), ["PA", "Properti"]),
+]
+
+_RULE_PATTERNS = [
+    (re.compile(r"\b(?:" + "|".join(keywords) + r")\w*", re.I), policies)
+    for keywords, policies in POLICY_RULES
+]
+
+
+@lru_cache(maxsize=1024)
+def classify_policies(text: str) -> str:
+    """Policies suggested by the sector/description text, in POLICY_ORDER ("" when no rule matches)."""
+    policies = set()
+    for pattern, suggested in _RULE_PATTERNS:
+        if pattern.search(text):
+            policies.update(suggested)
+    return ", ".join(p for p in POLICY_ORDER if p in policies)
+
+
+def derive_potensi_polis(inputs: Dict[str, str]) -> Optional[str]:
+    text = " ".join(value for value in inputs.values() if value)
+    if not text:
+        return None
+    # Cached on the normalized text, so companies in the same sector reuse the result
+    policies = classify_policies(" ".join(text.lower().split()))
+    # No rule matched: leave the field missing instead of guessing a classification
+    return policies or None
+
+
+DERIVATIONS: Dict[str, Callable[[Dict[str, str]], Optional[str]]] = {
+    "Potensi Polis": derive_potensi_polis,
+}
+
+
+def derive(field_name: str, inputs: Dict[str, str]) -> Optional[str]:
+    """Compute a derived field from its filled inputs; None when there is nothing to go on."""
+    derivation = DERIVATIONS.get(field_name)
+    if derivation is None:
+        logger.warning(f"No derivation registered for {field_name}")
+        return None
+    return derivation(inputs)
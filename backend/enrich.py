@@ -0,0 +1,173 @@
+"""Headless batch enrichment for CSV/Excel lead lists.
+
+Usage:
+    python -m backend.enrich leads.csv enriched.csv --column "Nama Perusahaan" --concurrency 5
+
+Rows are streamed from the input, researched concurrently and appended to the output CSV as
+soon as each company finishes. Re-running the same command resumes from the output file:
+rows already written there are skipped, so a crashed job never redoes finished companies.
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import sys
+from typing import Dict, Iterator, Set, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from backend.budget import Budget, JobBudget
+from backend.clients import build_research_pipeline, close_clients
+from backend.researcher import ENRICHMENT_SCHEMA, ResearchPipeline
+
+logger = logging.getLogger(__name__)
+
+ROW_COLUMN = "row"
+
+
+def create_pipeline(concurrency: int) -> ResearchPipeline:
+    """Build a ResearchPipeline on the shared, pooled clients using the Reflex app's environment variables."""
+    return build_research_pipeline(tavily_concurrency=max(5, concurrency), azure_concurrency=max(4, concurrency))
+
+
+def iter_rows(path: str, chunksize: int = 500) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield (row number, row) from a CSV in chunks, or from an Excel sheet."""
+    if path.lower().endswith((".xlsx", ".xls")):
+        # Excel cannot be streamed by pandas; the sheet is read once and rows are yielded lazily
+        chunks = [pd.read_excel(path, dtype=str)]
+    else:
+        chunks = pd.read_csv(path, dtype=str, chunksize=chunksize)
+
+    row_number = 0
+    for chunk in chunks:
+        for record in chunk.fillna("").to_dict(orient="records"):
+            yield row_number, record
+            row_number += 1
+
+
+def load_checkpoint(output_path: str) -> Set[int]:
+    """Return row numbers already written to the output file; a missing or empty file is no checkpoint."""
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return set()
+    try:
+        done = pd.read_csv(output_path, dtype=str, usecols=[ROW_COLUMN])
+    except pd.errors.EmptyDataError:
+        return set()
+    return {int(value) for value in done[ROW_COLUMN].dropna()}
+
+
+async def enrich_file(
+    input_path: str,
+    output_path: str,
+    column: str = "Nama Perusahaan",
+    concurrency: int = 3,
+    max_rounds: int = 3,
+):
+    if output_path.lower().endswith((".xlsx", ".xls")):
+        raise ValueError("Output must be a CSV file so results can be appended incrementally")
+
+    pipeline = create_pipeline(concurrency)
+    # JOB_BUDGET_* caps the whole run; rows started after it is spent keep only what they found
+    budget = Budget.from_env("JOB_BUDGET")
+    job_budget = JobBudget(budget) if budget else None
+    done = load_checkpoint(output_path)
+    if done:
+        logger.info(f"Resuming: {len(done)} rows already in {output_path}")
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    write_lock = asyncio.Lock()
+    writer = None
+    output_file = None
+    counts = {"done": 0, "failed": 0}
+
+    def write_row(row: Dict[str, str]):
+        nonlocal writer, output_file
+        if writer is None:
+            # Opened on the first result, so a run where every row fails leaves no empty checkpoint
+            output_file = open(output_path, "a", newline="", encoding="utf-8")
+            writer = csv.DictWriter(output_file, fieldnames=list(row.keys()), extrasaction="ignore")
+            if output_file.tell() == 0:
+                writer.writeheader()
+        writer.writerow(row)
+        output_file.flush()
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            row_number, record = item
+            company_name = str(record.get(column, "")).strip()
+            output_row = {ROW_COLUMN: str(row_number), **record}
+            try:
+                state = await pipeline.run_research(company_name, max_global_rounds=max_rounds, job_budget=job_budget)
+                for key, enriched in state.fields.items():
+                    output_row[key] = enriched.value
+                    output_row[f"{key} (confidence)"] = enriched.confidence
+                output_row["Budget Exhausted"] = state.budget_exhausted
+                async with write_lock:
+                    write_row(output_row)
+                counts["done"] += 1
+                m = state.metrics
+                logger.info(
+                    f"Completed row {row_number}: {company_name} "
+                    f"({m.get('search_calls', 0)} searches, {m.get('llm_calls', 0)} LLM calls, "
+                    f"{m.get('prompt_tokens', 0) + m.get('completion_tokens', 0)} tokens, {m.get('retries', 0)} retries)"
+                )
+            except Exception as e:
+                # Failed rows are not written, so the next run retries them
+                counts["failed"] += 1
+                logger.error(f"Error processing row {row_number} ({company_name}): {e}")
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        for row_number, record in iter_rows(input_path):
+            if row_number in done or not str(record.get(column, "")).strip():
+                continue
+            # Schema columns are filled from the research result, keep only the input's own columns
+            record = {k: v for k, v in record.items() if k not in ENRICHMENT_SCHEMA and k != ROW_COLUMN}
+            await queue.put((row_number, record))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        if output_file is not None:
+            output_file.close()
+        await close_clients()
+
+    logger.info(f"Finished: {counts['done']} enriched, {counts['failed']} failed, {len(done)} skipped from checkpoint")
+    logger.info(f"LLM JSON parsing: {pipeline.parse_stats.to_dict()}")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enrich a CSV/Excel lead list without the Reflex UI.")
+    parser.add_argument("input", help="Input .csv or .xlsx file")
+    parser.add_argument("output", help="Output .csv file (also used as the resume checkpoint)")
+    parser.add_argument("--column", default="Nama Perusahaan", help="Column holding the company name")
+    parser.add_argument("--concurrency", type=int, default=3, help="Companies researched at the same time")
+    parser.add_argument("--max-rounds", type=int, default=3, help="Maximum search rounds per company")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        counts = asyncio.run(enrich_file(args.input, args.output, args.column, max(1, args.concurrency), args.max_rounds))
+    except (ValueError, FileNotFoundError) as e:
+        logger.error(str(e))
+        return 1
+    if counts["failed"] and not counts["done"]:
+        logger.error(f"All {counts['failed']} rows failed, nothing written to {args.output}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
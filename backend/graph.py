@@ -1,16 +1,21 @@
 import asyncio
-import hashlib
 import logging
 import os
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Dict, Optional
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Dict, Optional, Tuple
 
 from dotenv import load_dotenv
-from langgraph.graph import END, START, StateGraph
 from openai import AsyncAzureOpenAI
 from tavily import TavilyClient
 
+from backend.cache import CompletionCache, SearchCache, completion_cache, search_cache
+from backend.metrics import current_summary, record
+from backend.ratelimit import RateLimiter
+from backend.researcher import ENRICHMENT_SCHEMA, EnrichmentField, ResearchPipeline, apply_derived, new_profile
+from backend.scheduler import is_missing
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,169 +23,157 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 
-class SearchCache:
-   
-    def __init__(self, max_size: int = 100):
-        self.cache: Dict[str, Dict] = {}
-        self.max_size = max_size
-   
-    def get_key(self, company: str, column: str) -> str:
-        """Generate MD5 hash key from company and column."""
-        return hashlib.md5(f"{company}_{column}".encode()).hexdigest()
-   
-    def get(self, company: str, column: str) -> Optional[Dict]:
-        """Retrieve cached result if exists."""
-        return self.cache.get(self.get_key(company, column))
-   
-    def set(self, company: str, column: str, result: Dict):
-        """Store result in cache with LRU-like eviction."""
-        if len(self.cache) >= self.max_size:
-            self.cache.pop(next(iter(self.cache)))
-        self.cache[self.get_key(company, column)] = result
-
-
 class LLMProvider(ABC):
     @abstractmethod
     async def generate(self, prompt: str) -> str:
         pass
 
 class AzureOpenAIProvider(LLMProvider):
-    def __init__(self, client, deployment_name: str):
+    def __init__(self, client, deployment_name: str, limiter: Optional[RateLimiter] = None):
         self.client = client
         self.deployment_name = deployment_name
+        self.limiter = limiter or RateLimiter("azure")
 
     async def generate(self, prompt: str) -> str:
-        response = await self.client.chat.completions.create(
-            model=self.deployment_name, messages=[{"role": "user", "content": prompt}]
+        response = await self.limiter.call(
+            lambda: self.client.chat.completions.create(
+                model=self.deployment_name, messages=[{"role": "user", "content": prompt}]
+            )
         )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            record("enrichment_llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, "prompt_tokens", kind="prompt")
+            record("enrichment_llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, "completion_tokens", kind="completion")
         return response.choices[0].message.content.strip()
 
 
-@dataclass
-class EnrichmentContext:
-    column_name: str
-    target_value: str
-    context_values: Dict[str, str]
-    search_result: Optional[Dict] = None
-    answer: Optional[str] = None
-# Initialize global search cache
-search_cache = SearchCache(max_size=100)
+class LLMProviderClient:
+    """chat.completions facade over a plain LLMProvider, so ResearchPipeline can drive any provider.
+
+    Only non-streaming calls without response_format are supported (see EnrichmentPipeline).
+    """
+
+    def __init__(self, provider: LLMProvider):
+        self.provider = provider
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, messages, **kwargs):
+        content = await self.provider.generate(messages[-1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+# Table headers that name a researched field differently
+COLUMN_ALIASES = {
+    "Kontak (Mobile/Email)": "Kontak",
+}
+
+# Extraction instructions for columns outside ENRICHMENT_SCHEMA
+COLUMN_GUIDELINES = {
+    "Nama Perusahaan": "Extract official company name only. Max 50 chars.",
+    "Produk Perusahaan": "Extract main products/services offered. Max 100 chars.",
+    "Aset Perusahaan": "Extract total assets value if available. Max 50 chars.",
+}
+DEFAULT_GUIDELINE = "Extract the most relevant value for this field. Max 100 chars."
+
+
+def cell_schema(column_name: str) -> Tuple[str, Dict[str, Dict]]:
+    """The field researched for a table column and the schema to research it with.
+
+    Derived fields bring their inputs along; unknown columns get a one-round ad-hoc field.
+    """
+    name = COLUMN_ALIASES.get(column_name, column_name)
+    spec = ENRICHMENT_SCHEMA.get(name)
+    if spec is None:
+        guideline = COLUMN_GUIDELINES.get(name, DEFAULT_GUIDELINE)
+        return name, {name: {"desc": f"{name}. {guideline}", "max_rounds": 1, "group": "cell"}}
+    schema = {name: spec}
+    for dep in spec.get("depends_on", []):
+        schema[dep] = ENRICHMENT_SCHEMA[dep]
+    return name, schema
 
 
 class EnrichmentPipeline:
-    def __init__(self, tavily_client, llm_provider: LLMProvider):
-        self.tavily = tavily_client
+    """Per-cell enrichment on the ResearchPipeline graph: one round for one column's field(s).
+
+    Searches, completions, rules, derived fields and metrics go through the same hot path
+    (and caches) as whole-company research.
+    """
+
+    def __init__(
+        self,
+        tavily_client,
+        llm_provider: LLMProvider,
+        search_limiter: Optional[RateLimiter] = None,
+        cache: Optional[SearchCache] = search_cache,
+        llm_cache: Optional[CompletionCache] = completion_cache,
+    ):
         self.llm = llm_provider
+        if isinstance(llm_provider, AzureOpenAIProvider):
+            client, deployment, limiter = llm_provider.client, llm_provider.deployment_name, llm_provider.limiter
+            response_format = os.getenv("LLM_RESPONSE_FORMAT", "json_object")
+        else:
+            client, deployment, limiter = LLMProviderClient(llm_provider), type(llm_provider).__name__, None
+            response_format = "none"
+        self.research = ResearchPipeline(
+            tavily_client,
+            client,
+            deployment,
+            cache=cache,
+            llm_cache=llm_cache,
+            azure_limiter=limiter,
+            tavily_limiter=search_limiter,
+            response_format=response_format,
+        )
 
-    async def search_tavily(self, state: EnrichmentContext):
-        """Run Tavily search with caching and optimized parameters."""
-        try:
-            # Check cache first
-            cached = search_cache.get(state.target_value, state.column_name)
-            if cached:
-                logger.info(f"Cache hit for {state.target_value} - {state.column_name}")
-                return {"search_result": cached}
-           
-            # Cache miss - perform search
-            query = f"{state.column_name} of {state.target_value}?"
-            logger.info(f"Searching Tavily: {query} (depth=advanced, max_results=2, raw_content=False, include_answer=True)")
-           
-            result = await asyncio.to_thread(
-                lambda: self.tavily.search(
-                    query=query,
-                    search_depth="advanced",  # Bisa pilih basic or advanced sesuai kebutuhan
-                    max_results=5,  
-                    include_raw_content=False,  # Disabled to avoid HTML bloat (~12K tokens saved)
-                    include_answers=True
-                )
+    async def enrich_cell(self, column_name: str, target_value: str, context_values: Dict[str, str]) -> Dict:
+        """Research one column for one company; known `context_values` of schema fields are not searched again."""
+        name, schema = cell_schema(column_name)
+        state = new_profile(target_value, schema)
+        # Count the cell's calls towards the caller's company summary, if there is one
+        summary = current_summary()
+        if summary is not None:
+            state.metrics = summary
+        for column, value in context_values.items():
+            known = COLUMN_ALIASES.get(column, column)
+            if known in state.fields and known != name and value:
+                state.fields[known].update(value, "High", "context")
+
+        # A derived column may already follow from the context alone
+        apply_derived(state.fields)
+        if is_missing(state.fields[name].value, state.fields[name].confidence):
+            await self.research.run_research(
+                target_value, max_global_rounds=1, state=state, schema=schema, generate_queries=False
             )
-           
-            logger.info(f"Tavily search completed with {len(result.get('results', []))} results")
-           
-            # Store in cache
-            search_cache.set(state.target_value, state.column_name, result)
-           
-            return {"search_result": result}
-        except Exception as e:
-            logger.error(f"❌ Error in search_tavily: {str(e)}")
-            raise
-
-    async def extract_minimal_answer(
-        self, state: EnrichmentContext
-    ) -> Dict:
-        """Use LLM to extract a minimal answer from Tavily's snippet results."""
-        # Build content from snippets only (not raw_content) - Fix 2
-        result_contents = []
-       
-        if state.search_result and "results" in state.search_result:
-            for result in state.search_result["results"][:5]:  # Max 2 results
-                snippet = result.get("content") or result.get("snippet", "")
-                if snippet:
-                    # Truncate to 500 chars to minimize tokens
-                    snippet_truncated = snippet[:500]
-                    title = result.get("title", "No title")
-                    result_contents.append(
-                        f"Title: {title}\nSnippet: {snippet_truncated}"
-                    )
-       
-        content = "\n\n---\n\n".join(result_contents) if result_contents else "No search results available"
-       
-        logger.info(f"Content prepared: {len(content)} chars (from {len(result_contents)} snippets)")
-       
-        try:
-            # Column-specific extraction rules
-            column_rules = {
-                "Nama Perusahaan": "Extract official company name only. Max 50 chars.",
-                "Sektor Perusahaan": "Extract primary industry sector. Max 50 chars.",
-                "Alamat": "Extract headquarters address with city and country. Max 100 chars.",
-                "Kontak (Mobile/Email)": "Extract official phone or email contact. Max 50 chars.",
-                "Potensi Polis": "Extract insurance needs or risk exposure info. Max 100 chars.",
-                "Jumlah Karyawan": "Extract employee count (exact number or range). Max 30 chars.",
-                "Produk Perusahaan": "Extract main products/services offered. Max 100 chars.",
-                "Kantor Cabang": "Extract branch office locations. Max 100 chars.",
-                "Aset Perusahaan": "Extract total assets value if available. Max 50 chars.",
-                "Laporan Keuangan": "Extract key financial metrics (revenue/profit). Max 100 chars."
-            }
-           
-            # Get column-specific instruction (with generic fallback)
-            column_guideline = column_rules.get(
-                state.column_name,
-                "Extract the most relevant value for this field. Max 100 chars."
-            )
-           
-            # Optimized prompt - only includes current column rule (Fix 3)
-            prompt = f"""You are an Insurance Data Enrichment Agent.
-
-Column: {state.column_name}
-Company: {state.target_value}
-Instruction: {column_guideline}
-
-Search Results:
-{content}
-
-Answer (only the value, no explanation):"""
-           
-            logger.info(f"Extracting answer for column '{state.column_name}' | company '{state.target_value}'")
-            logger.info(f"Prompt size: {len(prompt)} chars")
-
-            answer = await self.llm.generate(prompt)
-            logger.info(f"Extracted answer: {answer}")
-            return {"answer": answer}
-        except Exception as e:
-            logger.error(f"❌ Error in extract_minimal_answer: {str(e)}")
-            return {"answer": "Information not found"}
-
-    def build_graph(self):
-        """build and compile the graph"""
-        graph = StateGraph(EnrichmentContext)
-        graph.add_node("search", self.search_tavily)
-        graph.add_node("extract", self.extract_minimal_answer)
-        #graph.add_node("enrich", self.enrich)
-        graph.add_edge(START, "search")
-        graph.add_edge("search", "extract")
-        graph.add_edge("extract", END)
-        compiled_graph = graph.compile()
-        return compiled_graph
+        result: EnrichmentField = state.fields[name]
+        if result.value == "Tidak Tersedia":
+            return {"answer": "Information not found", "confidence": result.confidence, "source": result.source}
+        return {"answer": result.value, "confidence": result.confidence, "source": result.source}
+
+
+# Pipelines (and their compiled graphs) reused per (tavily_client, llm_provider, cache, llm_cache);
+# only the most recently used ones are kept, so callers creating clients per request do not pile them up
+MAX_CACHED_PIPELINES = 8
+_pipelines: "OrderedDict[Tuple[int, int, int, int], Tuple[object, LLMProvider, object, object, EnrichmentPipeline]]" = OrderedDict()
+
+
+def get_enrichment_pipeline(
+    tavily_client,
+    llm_provider: LLMProvider,
+    cache: Optional[SearchCache] = search_cache,
+    llm_cache: Optional[CompletionCache] = completion_cache,
+) -> EnrichmentPipeline:
+    key = (id(tavily_client), id(llm_provider), id(cache), id(llm_cache))
+    entry = _pipelines.get(key)
+    if entry is None:
+        # Keep references to the clients so their ids cannot be reused by other objects while cached
+        pipeline = EnrichmentPipeline(tavily_client, llm_provider, cache=cache, llm_cache=llm_cache)
+        entry = (tavily_client, llm_provider, cache, llm_cache, pipeline)
+        _pipelines[key] = entry
+        while len(_pipelines) > MAX_CACHED_PIPELINES:
+            _pipelines.popitem(last=False)
+    else:
+        _pipelines.move_to_end(key)
+    return entry[4]
 
 
 async def enrich_cell_with_graph(
@@ -188,50 +181,36 @@ async def enrich_cell_with_graph(
     target_value: str,
     context_values: Dict[str, str],
     tavily_client,
-    llm_provider: LLMProvider
+    llm_provider: LLMProvider,
+    cache: Optional[SearchCache] = search_cache,
+    llm_cache: Optional[CompletionCache] = completion_cache,
 ) -> Dict:
-    """Helper function to enrich a single cell using langgraph."""
+    """Helper function to enrich a single cell using langgraph (pass cache=None/llm_cache=None to bypass caching).
+
+    Returns {"answer", "confidence", "source"}.
+    """
     try:
         logger.info(f"Starting enrich_cell_with_graph for {target_value}")
-        pipeline = EnrichmentPipeline(tavily_client, llm_provider)
-        initial_context = EnrichmentContext(
-            column_name=column_name,
-            target_value=target_value,
-            context_values=context_values,
-            search_result=None,
-            answer=None
-        )
-        graph = pipeline.build_graph()
-        result = await graph.ainvoke(initial_context)
-        #print(f"Result: {result}")
+        pipeline = get_enrichment_pipeline(tavily_client, llm_provider, cache, llm_cache)
+        result = await pipeline.enrich_cell(column_name, target_value, context_values)
         logger.info(f"Completed enrich_cell_with_graph for {target_value}")
-        return result #, result['urls']
+        return result
     except Exception as e:
         logger.error(f"Error in enrich_cell_with_graph: {str(e)}")
-        return {"answer": "Error during enrichment", "search_result": None}
+        return {"answer": "Error during enrichment", "confidence": "Low", "source": ""}
 
 
 # Example usage:
 if __name__ == "__main__":
-    context = EnrichmentContext(
-        column_name="CEO",
-        target_value="Amazon",
-        context_values={
-            "Industry": "E-commerce",
-            "Founded": "1994",
-            "Location": "Seattle, WA",
-        },
-    )
-
     tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-   
+
     # Example with Azure OpenAI
     azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-   
+
     if not azure_endpoint or not deployment_name:
         raise ValueError("AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_DEPLOYMENT_NAME must be set")
-   
+
     azure_client = AsyncAzureOpenAI(
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
@@ -243,20 +222,10 @@ if __name__ == "__main__":
     )
     pipeline_azure = EnrichmentPipeline(tavily_client, azure_provider)
 
-    # Using the graph
-    graph = pipeline_azure.build_graph()
-    initial_context = EnrichmentContext(
-        column_name="CEO",
-        target_value="Amazon",
-        context_values={
-            "Industry": "E-commerce",
-            "Founded": "1994",
-            "Location": "Seattle, WA",
-        },
-        search_result=None,
-        answer=None
-    )
-    result = asyncio.run(graph.ainvoke(initial_context))
+    # Using the pipeline
+    result = asyncio.run(pipeline_azure.enrich_cell(
+        "Potensi Polis", "Amazon", {"Sektor Perusahaan": "E-commerce"}
+    ))
 
     # Or using the helper function
     result_helper = asyncio.run(enrich_cell_with_graph(
@@ -269,4 +238,4 @@ if __name__ == "__main__":
         },
         tavily_client=tavily_client,
         llm_provider=azure_provider
-    ))
\ No newline at end of file
+    ))
@@ -0,0 +1,384 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from backend.budget import Budget, JobBudget
+from backend.cache import normalize_query
+from backend.researcher import CompanyProfileState, ResearchPipeline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_DB = os.path.join(".cache", "enrichment_jobs.sqlite3")
+
+# Company statuses: pending -> running -> done | failed. "running" rows left behind by a
+# crashed process are picked up again on resume together with "pending" ones.
+RESUMABLE_STATUSES = ("pending", "running")
+# Events kept in memory per running job; subscribers lagging further behind skip ahead
+EVENT_BUFFER_SIZE = 10000
+
+
+class JobStore:
+    """SQLite store of enrichment jobs and a per-company checkpoint of CompanyProfileState.
+
+    The latest finished profile of every company is kept as well, with per-field
+    timestamps, so later runs can refresh only stale fields.
+    """
+
+    def __init__(self, path: str = DEFAULT_JOB_DB):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS job_companies (
+                    job_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    company_name TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    state TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, position)
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS company_profiles (
+                    company_key TEXT PRIMARY KEY,
+                    company_name TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(sql, params).fetchall()
+            conn.commit()
+        return rows
+
+    def create_job(
+        self, companies: List[Tuple[int, str]], seeds: Optional[Dict[int, CompanyProfileState]] = None
+    ) -> str:
+        """Register a job for (position, company_name) pairs and return its ID.
+
+        `seeds` maps positions to a starting state, e.g. from seed_refresh_state().
+        """
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        seeds = seeds or {}
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT INTO jobs (id, status, created_at, updated_at) VALUES (?, ?, ?, ?)", (job_id, "pending", now, now))
+            conn.executemany(
+                "INSERT INTO job_companies (job_id, position, company_name, status, state, updated_at) VALUES (?, ?, ?, 'pending', ?, ?)",
+                [
+                    (job_id, position, name, json.dumps(seeds[position].to_dict()) if position in seeds else None, now)
+                    for position, name in companies
+                ],
+            )
+            conn.commit()
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute("SELECT id, status, created_at, updated_at FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        return dict(zip(("id", "status", "created_at", "updated_at"), rows[0]))
+
+    def latest_unfinished_job(self) -> Optional[str]:
+        rows = self._execute(
+            "SELECT id FROM jobs WHERE status IN ('pending', 'running', 'paused', 'cancelled') "
+            "AND EXISTS (SELECT 1 FROM job_companies WHERE job_companies.job_id = jobs.id) "
+            "ORDER BY updated_at DESC LIMIT 1"
+        )
+        return rows[0][0] if rows else None
+
+    def set_job_status(self, job_id: str, status: str):
+        self._execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def pause_job(self, job_id: str):
+        """Ask running workers to stop after their current round; progress is kept."""
+        self.set_job_status(job_id, "paused")
+
+    def is_paused(self, job_id: str) -> bool:
+        job = self.get_job(job_id)
+        return job is not None and job["status"] == "paused"
+
+    def companies(self, job_id: str) -> List[Dict[str, Any]]:
+        rows = self._execute(
+            "SELECT position, company_name, status, state, error FROM job_companies WHERE job_id = ? ORDER BY position",
+            (job_id,),
+        )
+        return [
+            {
+                "position": position,
+                "company_name": name,
+                "status": status,
+                "state": CompanyProfileState.from_dict(json.loads(state)) if state else None,
+                "error": error,
+            }
+            for position, name, status, state, error in rows
+        ]
+
+    def save_checkpoint(self, job_id: str, position: int, state: CompanyProfileState, status: str = "running"):
+        self._execute(
+            "UPDATE job_companies SET state = ?, status = ?, error = NULL, updated_at = ? WHERE job_id = ? AND position = ?",
+            (json.dumps(state.to_dict()), status, time.time(), job_id, position),
+        )
+
+    def mark_company(self, job_id: str, position: int, status: str, error: Optional[str] = None):
+        self._execute(
+            "UPDATE job_companies SET status = ?, error = ?, updated_at = ? WHERE job_id = ? AND position = ?",
+            (status, error, time.time(), job_id, position),
+        )
+
+    def retry_company(self, job_id: str, position: int, reset: bool = False):
+        """Queue a company again; with reset=True its checkpoint is discarded and research restarts."""
+        if reset:
+            self._execute(
+                "UPDATE job_companies SET status = 'pending', state = NULL, error = NULL, updated_at = ? WHERE job_id = ? AND position = ?",
+                (time.time(), job_id, position),
+            )
+        else:
+            self.mark_company(job_id, position, "pending")
+
+    def save_profile(self, state: CompanyProfileState):
+        """Keep the company's latest result, without its logs, as the base for future refreshes."""
+        data = state.to_dict()
+        data["iteration_logs"] = []
+        self._execute(
+            "INSERT OR REPLACE INTO company_profiles (company_key, company_name, state, updated_at) VALUES (?, ?, ?, ?)",
+            (normalize_query(state.company_name), state.company_name, json.dumps(data), time.time()),
+        )
+
+    def get_profile(self, company_name: str) -> Optional[CompanyProfileState]:
+        rows = self._execute("SELECT state FROM company_profiles WHERE company_key = ?", (normalize_query(company_name),))
+        return CompanyProfileState.from_dict(json.loads(rows[0][0])) if rows else None
+
+    def retry_failed(self, job_id: str):
+        self._execute(
+            "UPDATE job_companies SET status = 'pending', error = NULL, updated_at = ? WHERE job_id = ? AND status = 'failed'",
+            (time.time(), job_id),
+        )
+
+
+async def run_job_stream(
+    store: JobStore,
+    pipeline: ResearchPipeline,
+    job_id: str,
+    concurrency: int = 3,
+    max_global_rounds: int = 3,
+    limit: Optional[asyncio.Semaphore] = None,
+    job_budget: Optional[Budget] = None,
+):
+    """Run (or resume) a job's unfinished companies concurrently, checkpointing after every round.
+
+    Yields (event_type, position, company_name, payload) with event_type one of
+    "start", "log", "field", "result", "error" or "paused"; "field" payloads are
+    (field_name, value, confidence) tuples streamed mid-extraction. Completed companies are never re-queried.
+    Pass `limit` to share one concurrency cap between several jobs. With a `job_budget`,
+    companies stop early (with `budget_exhausted` set) once the whole job has used it up.
+    """
+    # SQLite calls (and the JSON encoding of checkpoints) run in worker threads, off the event loop
+    companies = await asyncio.to_thread(store.companies, job_id)
+    todo = [c for c in companies if c["status"] in RESUMABLE_STATUSES]
+    await asyncio.to_thread(store.set_job_status, job_id, "running")
+    shared_budget = None
+    if job_budget is not None:
+        shared_budget = JobBudget(job_budget)
+        # Tokens and searches of companies finished before a resume count too
+        for company in companies:
+            if company["status"] not in RESUMABLE_STATUSES and company["state"] is not None:
+                shared_budget.track(company["state"].metrics)
+
+    events: asyncio.Queue = asyncio.Queue()
+    if limit is None:
+        limit = asyncio.Semaphore(max(1, concurrency))
+
+    async def worker(company: Dict[str, Any]):
+        position, company_name = company["position"], company["company_name"]
+        async with limit:
+            if await asyncio.to_thread(store.is_paused, job_id):
+                await events.put(("paused", position, company_name, None))
+                return
+            await events.put(("start", position, company_name, None))
+            await asyncio.to_thread(store.mark_company, job_id, position, "running")
+            try:
+                result_state = None
+                async for event in pipeline.run_research_stream(
+                    company_name, max_global_rounds, state=company["state"], job_budget=shared_budget
+                ):
+                    event_type, payload = event[0], event[1:] if event[0] == "field" else event[1]
+                    if event_type in ("log", "field"):
+                        await events.put((event_type, position, company_name, payload))
+                    elif event_type == "checkpoint":
+                        await asyncio.to_thread(store.save_checkpoint, job_id, position, payload)
+                        if await asyncio.to_thread(store.is_paused, job_id):
+                            await asyncio.to_thread(store.mark_company, job_id, position, "pending")
+                            await events.put(("paused", position, company_name, payload))
+                            return
+                    elif event_type == "result":
+                        result_state = payload
+                if result_state is None:
+                    raise ValueError("No result returned from research pipeline.")
+                await asyncio.to_thread(store.save_checkpoint, job_id, position, result_state, "done")
+                await asyncio.to_thread(store.save_profile, result_state)
+                await events.put(("result", position, company_name, result_state))
+            except Exception as e:
+                await asyncio.to_thread(store.mark_company, job_id, position, "failed", str(e))
+                await events.put(("error", position, company_name, e))
+
+    tasks = [asyncio.create_task(worker(company)) for company in todo]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event = await events.get()
+            if event[0] in ("result", "error", "paused"):
+                remaining -= 1
+            yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if not await asyncio.to_thread(store.is_paused, job_id):
+        statuses = {c["status"] for c in await asyncio.to_thread(store.companies, job_id)}
+        await asyncio.to_thread(store.set_job_status, job_id, "failed" if "failed" in statuses else "done")
+
+
+@dataclass
+class JobProgress:
+    """In-memory progress of a job running in the JobManager, read by UI subscribers."""
+    job_id: str
+    total: int
+    finished: int = 0
+    status: str = "queued"
+    events: Deque[Tuple[str, int, str, Any]] = field(default_factory=lambda: deque(maxlen=EVENT_BUFFER_SIZE))
+    # Total events ever appended, so cursors stay valid after old events are dropped
+    event_count: int = 0
+
+
+class JobManager:
+    """Runs enrichment jobs as background asyncio tasks, independent of any client session.
+
+    All jobs share one cap on companies researched at the same time. Subscribers poll
+    `events_since()` with their own cursor to receive logs and finished rows.
+    """
+
+    def __init__(self, store: JobStore, max_concurrent_companies: int = 3, job_budget: Optional[Budget] = None):
+        self.store = store
+        self.max_concurrent_companies = max(1, max_concurrent_companies)
+        self.job_budget = job_budget
+        self._limit: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._progress: Dict[str, JobProgress] = {}
+
+    def submit(
+        self,
+        job_id: str,
+        pipeline: ResearchPipeline,
+        total: int,
+        finished: int = 0,
+        max_global_rounds: int = 3,
+    ) -> JobProgress:
+        if job_id in self._tasks and not self._tasks[job_id].done():
+            return self._progress[job_id]
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.max_concurrent_companies)
+
+        progress = JobProgress(job_id=job_id, total=total, finished=finished)
+        self._progress[job_id] = progress
+        self._tasks[job_id] = asyncio.create_task(self._run(progress, pipeline, max_global_rounds))
+        return progress
+
+    async def _run(self, progress: JobProgress, pipeline: ResearchPipeline, max_global_rounds: int):
+        progress.status = "running"
+        try:
+            async for event in run_job_stream(
+                self.store,
+                pipeline,
+                progress.job_id,
+                max_global_rounds=max_global_rounds,
+                limit=self._limit,
+                job_budget=self.job_budget,
+            ):
+                if event[0] in ("result", "error"):
+                    progress.finished += 1
+                progress.events.append(event)
+                progress.event_count += 1
+            job = await asyncio.to_thread(self.store.get_job, progress.job_id)
+            progress.status = job["status"] if job else "done"
+        except asyncio.CancelledError:
+            progress.status = "cancelled"
+            # Synchronous: the task is being cancelled, so nothing more may be awaited
+            self.store.set_job_status(progress.job_id, "cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Job {progress.job_id} crashed: {e}")
+            progress.status = "failed"
+            await asyncio.to_thread(self.store.set_job_status, progress.job_id, "failed")
+
+    def status(self, job_id: str) -> Optional[JobProgress]:
+        return self._progress.get(job_id)
+
+    def events_since(self, job_id: str, cursor: int) -> Tuple[List[Tuple[str, int, str, Any]], int]:
+        """Return events after `cursor` and the new cursor."""
+        progress = self._progress.get(job_id)
+        if progress is None:
+            return [], cursor
+        first = progress.event_count - len(progress.events)
+        return list(islice(progress.events, max(0, cursor - first), None)), progress.event_count
+
+    def is_active(self, job_id: str) -> bool:
+        task = self._tasks.get(job_id)
+        return task is not None and not task.done()
+
+    def pause(self, job_id: str):
+        """Stop the job after each company's current round; it can be resumed later."""
+        self.store.pause_job(job_id)
+
+    def cancel(self, job_id: str):
+        """Stop the job immediately; checkpoints up to the last finished round are kept."""
+        task = self._tasks.get(job_id)
+        if task is not None and not task.done():
+            task.cancel()
+
+    def forget(self, job_id: str):
+        if not self.is_active(job_id):
+            self._tasks.pop(job_id, None)
+            self._progress.pop(job_id, None)
+
+
+job_store = JobStore(os.getenv("ENRICHMENT_JOB_DB", DEFAULT_JOB_DB))
+job_manager = JobManager(
+    job_store,
+    max_concurrent_companies=int(os.getenv("ENRICHMENT_CONCURRENCY", 3)),
+    job_budget=Budget.from_env("JOB_BUDGET"),
+)
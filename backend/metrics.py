@@ -0,0 +1,171 @@
+"""In-process metrics for the enrichment hot path.
+
+Spans time each stage (query generation, searches, extraction, graph nodes) into
+latency histograms; counters track API calls, tokens, cache hits and retries. Everything
+is also added to the summary of the company being researched (see `company_summary`),
+and `render_prometheus()` serves the totals in the Prometheus text format.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+METRIC_HELP = {
+    "enrichment_stage_seconds": ("histogram", "Latency of pipeline stages"),
+    "enrichment_api_calls_total": ("counter", "Requests sent to external APIs"),
+    "enrichment_llm_tokens_total": ("counter", "LLM tokens by kind (prompt/completion)"),
+    "enrichment_cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "enrichment_retries_total": ("counter", "Retried API calls by reason"),
+    "enrichment_llm_json_total": ("counter", "LLM JSON answers by parse outcome"),
+}
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_current_summary: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "enrichment_company_summary", default=None
+)
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and labels."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[LabelKey, float] = {}
+        # bucket counts, sum, count
+        self._histograms: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> LabelKey:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, amount: float = 1, **labels: Any):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, **labels: Any):
+        key = self._key(name, labels)
+        with self._lock:
+            counts, total, count = self._histograms.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._histograms[key] = (counts, total + value, count + 1)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: (list(v[0]), v[1], v[2]) for k, v in self._histograms.items()}
+
+        lines: List[str] = []
+        names = sorted({k[0] for k in counters} | {k[0] for k in histograms})
+        for name in names:
+            kind, description = METRIC_HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {bucket_count}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+def new_summary() -> Dict[str, Any]:
+    return {
+        "stages": {},
+        "search_calls": 0,
+        "search_cache_hits": 0,
+        "llm_calls": 0,
+        "completion_cache_hits": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "retries": 0,
+    }
+
+
+@contextmanager
+def company_summary(summary: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Attribute spans and counters in this block (and tasks it starts) to one company."""
+    for key, value in new_summary().items():
+        summary.setdefault(key, value)
+    token = _current_summary.set(summary)
+    try:
+        yield summary
+    finally:
+        _current_summary.reset(token)
+
+
+def bind_summary(summary: Dict[str, Any]):
+    """Like company_summary(), for async generators whose context cannot be reset across yields."""
+    for key, value in new_summary().items():
+        summary.setdefault(key, value)
+    _current_summary.set(summary)
+
+
+def current_summary() -> Optional[Dict[str, Any]]:
+    """The summary spans and counters are currently attributed to, if any."""
+    return _current_summary.get()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a pipeline stage into enrichment_stage_seconds and the company summary."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def record_stage(stage: str, seconds: float):
+    registry.observe("enrichment_stage_seconds", seconds, stage=stage)
+    summary = _current_summary.get()
+    if summary is not None:
+        stage_stats = summary["stages"].setdefault(stage, {"calls": 0, "seconds": 0.0})
+        stage_stats["calls"] += 1
+        stage_stats["seconds"] = round(stage_stats["seconds"] + seconds, 3)
+
+
+def record(metric: str, amount: float = 1, summary_key: Optional[str] = None, **labels: Any):
+    """Increment a counter, and the company summary's `summary_key` when one is given."""
+    registry.inc(metric, amount, **labels)
+    summary = _current_summary.get()
+    if summary is not None and summary_key:
+        summary[summary_key] = summary.get(summary_key, 0) + amount
+
+
+def render_prometheus() -> str:
+    return registry.render()
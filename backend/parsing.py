@@ -0,0 +1,182 @@
+import json
+import logging
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalObjectParser:
+    """Parse a streamed JSON object and emit each top-level member as soon as it is complete.
+
+    Text before the opening brace (e.g. a ```json fence) is ignored. Feed chunks with
+    `feed()`, which yields (key, value) pairs for members finished by that chunk.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.member_start = -1
+        self.done = False
+
+    def feed(self, chunk: str) -> Iterator[Tuple[str, Any]]:
+        self.buffer += chunk
+        while self.pos < len(self.buffer) and not self.done:
+            char = self.buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                if self.depth > 0:
+                    self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                if self.depth == 1:
+                    self.member_start = self.pos + 1
+            elif char in "}]":
+                if self.depth == 1:
+                    yield from self._emit(self.pos)
+                    self.done = True
+                self.depth -= 1
+            elif char == "," and self.depth == 1:
+                yield from self._emit(self.pos)
+                self.member_start = self.pos + 1
+            self.pos += 1
+
+    def _emit(self, end: int) -> Iterator[Tuple[str, Any]]:
+        member = self.buffer[self.member_start:end].strip()
+        if not member:
+            return
+        try:
+            yield from json.loads("{" + member + "}").items()
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping unparseable streamed member: {e}")
+
+
+def parse_members(text: str) -> List[Tuple[str, Any]]:
+    """Parse every complete top-level member of a (possibly truncated) JSON object."""
+    return list(IncrementalObjectParser().feed(text))
+
+
+class MalformedJSONError(ValueError):
+    """LLM output that is not valid JSON even after local repair."""
+
+
+@dataclass
+class ParseStats:
+    """Counters for LLM JSON output: clean parses, local repairs, LLM repair calls and failures."""
+    parsed: int = 0
+    repaired: int = 0
+    llm_repairs: int = 0
+    failed: int = 0
+
+    def count(self, outcome: str):
+        """Bump one counter and export it as enrichment_llm_json_total{outcome=...}."""
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        metrics.record("enrichment_llm_json_total", outcome=outcome)
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+def extract_json_text(content: str) -> str:
+    """Strip markdown fences and prose around the first JSON object or array."""
+    if "```" in content:
+        fenced = content.split("```")[1]
+        content = fenced[4:] if fenced.startswith("json") else fenced
+    starts = [i for i in (content.find("{"), content.find("[")) if i >= 0]
+    return content[min(starts):].strip() if starts else content.strip()
+
+
+def repair_json(text: str) -> str:
+    """Best-effort fix for common LLM JSON mistakes.
+
+    Drops trailing commas and anything after the top-level value, and closes objects and
+    arrays left open by a truncated answer. A string cut off by the truncation is dropped
+    (a member value becomes null) rather than closed, so a half-written value is never kept.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escape = False
+    # Start of an object key whose value has not begun yet
+    pending_key = -1
+    string_start = -1
+    for char in text:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+            string_start = len(out)
+            previous = "".join(out).rstrip()[-1:]
+            if stack and stack[-1] == "}" and previous in ("{", ","):
+                pending_key = len(out)
+        elif char == ":":
+            pending_key = -1
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            _strip_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                break
+            continue
+        out.append(char)
+    if stack and pending_key >= 0:
+        # Truncated inside or right after a key: drop the dangling key
+        del out[pending_key:]
+        in_string = False
+    if in_string:
+        # Truncated inside a value: drop the partial string
+        del out[string_start:]
+    _strip_trailing_comma(out)
+    if out and out[-1].rstrip().endswith(":"):
+        out.append("null")
+    out.extend(reversed(stack))
+    return "".join(out)
+
+
+def _strip_trailing_comma(out: List[str]):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def parse_json_lenient(content: str, stats: Optional[ParseStats] = None) -> Any:
+    """Parse LLM JSON output, falling back to `repair_json`; raises MalformedJSONError if both fail."""
+    text = extract_json_text(content)
+    try:
+        value = json.loads(text)
+        if stats:
+            stats.count("parsed")
+        return value
+    except json.JSONDecodeError as e:
+        error = e
+    try:
+        value = json.loads(repair_json(text))
+    except json.JSONDecodeError:
+        if stats:
+            stats.count("failed")
+        raise MalformedJSONError(f"Unparseable JSON output: {error}") from error
+    if stats:
+        stats.count("repaired")
+    logger.info("Repaired malformed JSON output")
+    return value
@@ -0,0 +1,176 @@
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+import openai
+from tavily.errors import UsageLimitExceededError
+
+from backend.metrics import record
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `rate_per_minute`.
+
+    The rate is adaptive: `penalize()` halves it after a throttle response and
+    `recover()` adds back 5% of the configured rate after each success.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.max_rate = rate_per_minute / 60.0
+        self.rate = self.max_rate
+        # Allow a burst of ~10 seconds of traffic by default
+        self.capacity = capacity or max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        # Requests larger than the bucket still go through once it is full
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) tokens once the real usage is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def penalize(self):
+        self.rate = max(self.max_rate * 0.1, self.rate * 0.5)
+
+    def recover(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Read Retry-After / retry-after-ms from an HTTP error response, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def is_throttle(error: BaseException) -> bool:
+    return isinstance(error, (openai.RateLimitError, UsageLimitExceededError)) or _status_code(error) == 429
+
+
+def is_retryable(error: BaseException) -> bool:
+    if is_throttle(error):
+        return True
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+class RateLimiter:
+    """Shared limiter for one API: requests/min and optional tokens/min buckets plus retry with backoff.
+
+    Throttle responses slow the buckets down and pause every caller until the server's
+    Retry-After has passed; other transient errors are retried with full-jitter
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.blocked_until = 0.0
+        self.retries = 0
+        self.throttled = 0
+
+    async def acquire(self, tokens: float = 0):
+        delay = self.blocked_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens and tokens:
+            await self.tokens.acquire(tokens)
+
+    def record_usage(self, estimated: float, actual: float):
+        if self.tokens:
+            self.tokens.adjust(actual - estimated)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, request: Callable[[], Awaitable[Any]], tokens: float = 0) -> Any:
+        """Run `request` under the limiter, retrying throttled and transient failures."""
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            try:
+                result = await request()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                if is_throttle(e):
+                    self.throttled += 1
+                    for bucket in (self.requests, self.tokens):
+                        if bucket:
+                            bucket.penalize()
+                    # Every caller waits out the server's cool-down, not just this one
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+                self.retries += 1
+                record("enrichment_retries_total", summary_key="retries", api=self.name, reason="throttle" if is_throttle(e) else "error")
+                attempt += 1
+                logger.warning(f"{self.name}: {type(e).__name__}, retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            for bucket in (self.requests, self.tokens):
+                if bucket:
+                    bucket.recover()
+            return result
@@ -1,10 +1,27 @@
 import asyncio
+import copy
 import json
 import logging
+import time
+from contextlib import aclosing
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Annotated, Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
 from tavily import TavilyClient
-from openai import AzureOpenAI, AsyncAzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI, BadRequestError
+from langgraph.config import get_stream_writer
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Send
+
+from backend.budget import Budget, BudgetTracker, JobBudget
+from backend.cache import CompletionCache, PersistentCache, SearchCache, completion_cache, normalize_query, search_cache
+from backend.context import build_context, count_tokens
+from backend.derived import derive
+from backend.metrics import bind_summary, company_summary, record, record_stage, span
+from backend.parsing import IncrementalObjectParser, MalformedJSONError, ParseStats, parse_json_lenient
+from backend.ratelimit import RateLimiter
+from backend.rules import extract_with_rules
+from backend.scheduler import FieldScheduler, is_missing
+from backend.search import SearchProvider, SingleFlight, as_search_provider
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -22,170 +39,776 @@ class EnrichmentField:
     confidence: str = "Low"
     source: str = ""
     rounds_taken: int = 0
+    stalled_rounds: int = 0
+    # Unix time the value was last filled, used to find stale fields when refreshing
+    updated_at: float = 0.0
+    # Kept value due for re-research (refresh); it is only replaced by an answer at least as confident
+    stale: bool = False
+
+    def update(self, value: Any, confidence: str, source: str = ""):
+        self.value = value
+        self.confidence = confidence
+        if source:
+            self.source = source
+        self.updated_at = time.time()
+        self.stale = False
 
 @dataclass
 class CompanyProfileState:
     company_name: str
     fields: Dict[str, EnrichmentField]
     iteration_logs: List[str] = field(default_factory=list)
+    rounds_completed: int = 0
+    schedule_stats: Dict[str, int] = field(default_factory=dict)
+    # Per-company latency/token/call summary filled by backend.metrics
+    metrics: Dict[str, Any] = field(default_factory=dict)
+    # Why research stopped early with fields still missing (company or job budget), "" if it did not
+    budget_exhausted: str = ""
 
     def to_dict(self):
         return{
             "company_name": self.company_name,
-            "fields": {k: {"value": v.value, "confidence": v.confidence, "source": v.source} for k, v in self.fields.items()},
-            "iteration_logs": self.iteration_logs
+            "fields": {k: {"value": v.value, "confidence": v.confidence, "source": v.source, "rounds_taken": v.rounds_taken, "stalled_rounds": v.stalled_rounds, "updated_at": v.updated_at, "stale": v.stale} for k, v in self.fields.items()},
+            "iteration_logs": self.iteration_logs,
+            "rounds_completed": self.rounds_completed,
+            "schedule_stats": self.schedule_stats,
+            "metrics": self.metrics,
+            "budget_exhausted": self.budget_exhausted
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompanyProfileState":
+        """Rebuild a state saved with to_dict(), e.g. from a job checkpoint."""
+        fields = {k: EnrichmentField() for k in ENRICHMENT_SCHEMA.keys()}
+        for k, v in data.get("fields", {}).items():
+            fields[k] = EnrichmentField(
+                value=v.get("value", "Tidak Tersedia"),
+                confidence=v.get("confidence", "Low"),
+                source=v.get("source", ""),
+                rounds_taken=v.get("rounds_taken", 0),
+                stalled_rounds=v.get("stalled_rounds", 0),
+                updated_at=v.get("updated_at", 0.0),
+                stale=v.get("stale", False),
+            )
+        return cls(
+            company_name=data["company_name"],
+            fields=fields,
+            iteration_logs=list(data.get("iteration_logs", [])),
+            rounds_completed=data.get("rounds_completed", 0),
+            schedule_stats=dict(data.get("schedule_stats", {})),
+            metrics=dict(data.get("metrics", {})),
+            budget_exhausted=data.get("budget_exhausted", ""),
+        )
+
 ENRICHMENT_SCHEMA = {
     "Sektor Perusahaan": {
         "desc": "Industri Utama Perusahaan (Max 5 kata). Contoh: 'Jasa Pengiriman Barang dan Logistik', 'Information and Communication Technology'.",
-        "max_rounds": 2
+        "max_rounds": 2,
+        "group": "profil"
     },
     "Alamat": {
         "desc": "Alamat lengkap kantor pusat (Jalan, Kelurahan, Kecamatan, Kota, Kode Pos).",
-        "max_rounds": 3
+        "max_rounds": 3,
+        "group": "kontak"
     },
     "Kontak": {
         "desc": "Email dan nomor telepon utama perusahaan yang dapat dihubungi untuk kerjasama.",
-        "max_rounds": 2
+        "max_rounds": 2,
+        "group": "kontak"
     },
     "Potensi Polis": {
         "desc": "Klasifikasi kebutuhan asuransi berdasarkan Short Description & Sektor Perusahaan. Pilih dari: MV4, TPL, PA, MV2, Properti, Travel, Cargo.",
-        "max_rounds": 1
+        "max_rounds": 1,
+        "group": "profil",
+        # Computed locally from its inputs (backend/derived.py), never searched for
+        "derived": True,
+        "depends_on": ["Sektor Perusahaan", "Short Description"]
     },
     "Jumlah Karyawan": {
         "desc": "Total jumlah karyawan aktif terbaru di perusahaan tersebut (dalam bentuk angka ataupun range). Contoh: '100-200', '1500'.",
-        "max_rounds": 3
+        "max_rounds": 3,
+        "group": "laporan"
     },
     "Short Description": {
         "desc": "Deskripsi singkat terkait bisnis perusahaan (1-3 kalimat). Fokus pada produk/jasa utama",
-        "max_rounds": 2
+        "max_rounds": 2,
+        "group": "profil"
     },
     "Kantor Cabang": {
         "desc": "Jumlah kantor cabang yang dimiliki perusahaan tersebut di seluruh indonesia. Tambahkan terkait list informasi detail wilayah kota kantor cabangnya. Contoh: '3 Kantor Cabang (Surabaya, Semarang, Denpasar).",
-        "max_rounds": 3
+        "max_rounds": 3,
+        "group": "kontak"
     },
     "PIC Perusahaan": {
         "desc": "Nama Key Person (CEO/Owner/Direktur). Contoh: 'Royan Rosyad (CEO)'.",
-        "max_rounds": 3
+        "max_rounds": 3,
+        "group": "laporan"
     },
     "Laporan Keuangan": {
         "desc": "Revenue atau Laba tahun terbaru 2025 (jika ada). Contoh: 'Revenue 500 Miliar Rupiah (2025)'.",
-        "max_rounds": 3
+        "max_rounds": 3,
+        "group": "laporan"
     }
 }
+
+
+RESPONSE_FORMATS = ("json_schema", "json_object", "none")
+# Tavily searches per company per round, shared by the field groups of that round
+MAX_QUERIES_PER_ROUND = 5
+CONFIDENCE_LEVELS = {"Low": 0, "Medium": 1, "High": 2}
+
+
+def parse_json_content(content: str) -> Any:
+    """Parse a JSON payload that may be wrapped in a markdown code fence or slightly malformed."""
+    return parse_json_lenient(content)
+
+
+def field_value_schema() -> Dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": {
+            "value": {"type": "string"},
+            "confidence": {"type": "string", "enum": ["High", "Medium", "Low"]},
+        },
+        "required": ["value", "confidence"],
+        "additionalProperties": False,
+    }
+
+
+def extraction_schema(target_fields: List[str], schema: Dict[str, Dict] = ENRICHMENT_SCHEMA) -> Dict[str, Any]:
+    """JSON schema for an extraction answer covering `target_fields` of `schema`."""
+    return {
+        "type": "object",
+        "properties": {
+            name: {**field_value_schema(), "description": schema[name]["desc"]}
+            for name in target_fields
+        },
+        "required": list(target_fields),
+        "additionalProperties": False,
+    }
+
+
+def grouped_queries_schema(group_names: List[str]) -> Dict[str, Any]:
+    """JSON schema for one query-generation answer covering every field group of a round."""
+    return {
+        "type": "object",
+        "properties": {name: {"type": "array", "items": {"type": "string"}} for name in group_names},
+        "required": list(group_names),
+        "additionalProperties": False,
+    }
+
+
+def fallback_queries(company_name: str, field_names: List[str]) -> List[str]:
+    return [f"{company_name} {name}" for name in field_names]
+
+
+def parse_grouped_queries(data: Any, company_name: str, groups: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Read {"group": [queries]}; groups the answer leaves out get templated queries.
+
+    A bare list or {"queries": [...]} (older prompts) is accepted when there is a single group.
+    """
+    if len(groups) == 1 and (isinstance(data, list) or (isinstance(data, dict) and "queries" in data)):
+        data = {next(iter(groups)): data.get("queries") if isinstance(data, dict) else data}
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object of query lists")
+    parsed = {}
+    for group, fields in groups.items():
+        queries = data.get(group)
+        if isinstance(queries, list) and queries:
+            parsed[group] = [str(query) for query in queries]
+        else:
+            parsed[group] = fallback_queries(company_name, fields)
+    if all(not isinstance(data.get(group), list) for group in groups):
+        raise ValueError("No query list for any group")
+    return parsed
+
+
+def valid_field_value(data: Any) -> bool:
+    """A {"value": non-empty string, "confidence": High/Medium/Low} member, as extraction_schema asks for."""
+    return (
+        isinstance(data, dict)
+        and isinstance(data.get("value"), str)
+        and bool(data["value"].strip())
+        and data.get("confidence") in CONFIDENCE_LEVELS
+    )
+
+
+def apply_extraction(extracted_data: Dict[str, Any], current_fields: Dict[str, EnrichmentField]) -> List[str]:
+    """Copy extracted values into the field state, ignoring unknown fields and empty or malformed answers.
+
+    Returns the names of the fields that were updated.
+    """
+    updated = []
+    if not isinstance(extracted_data, dict):
+        logger.warning(f"Ignoring extraction that is not a JSON object: {type(extracted_data).__name__}")
+        return updated
+    for field, data in extracted_data.items():
+        if field not in current_fields:
+            continue
+        if not valid_field_value(data):
+            # e.g. a member cut off by a truncated answer (repair_json turns it into null)
+            logger.warning(f"Ignoring invalid extraction for {field}: {data!r}")
+            continue
+        # Only update if found something better: a filled value (a rule match, a stale value being
+        # refreshed) is only replaced by an answer at least as confident
+        if data["value"] != "Tidak Tersedia" and replaces(current_fields[field], data["confidence"]):
+            current_fields[field].update(data["value"].strip(), data["confidence"])
+            updated.append(field)
+    return updated
+
+
+def replaces(current: EnrichmentField, confidence: str) -> bool:
+    """Whether a new answer with `confidence` may overwrite the field's current value."""
+    if is_missing(current.value, current.confidence):
+        return True
+    return CONFIDENCE_LEVELS.get(confidence, 0) >= CONFIDENCE_LEVELS.get(current.confidence, 0)
+
+
+def needs_search(field: EnrichmentField) -> bool:
+    return is_missing(field.value, field.confidence) or field.stale
+
+
+def extraction_targets(
+    fields: Dict[str, EnrichmentField], schema: Dict[str, Dict] = ENRICHMENT_SCHEMA, recheck: Sequence[str] = ()
+) -> List[str]:
+    """Missing fields (plus `recheck`, e.g. rule matches) the LLM should extract; derived fields are computed locally."""
+    return [
+        k for k, v in fields.items()
+        if (needs_search(v) or k in recheck) and not schema.get(k, {}).get("derived")
+    ]
+
+
+def apply_derived(fields: Dict[str, EnrichmentField]) -> List[str]:
+    """Recompute derived fields from their filled inputs and return the ones that changed."""
+    updated = []
+    for name, spec in ENRICHMENT_SCHEMA.items():
+        if not spec.get("derived") or name not in fields:
+            continue
+        inputs = {
+            dep: fields[dep].value for dep in spec.get("depends_on", [])
+            if dep in fields and not is_missing(fields[dep].value, fields[dep].confidence)
+        }
+        value = derive(name, inputs) if inputs else None
+        if value is None or value == fields[name].value:
+            continue
+        fields[name].update(value, "Medium", "derived: " + ", ".join(inputs))
+        updated.append(name)
+    return updated
+
+
+def needs_refresh(field: EnrichmentField, max_age: float, min_confidence: str = "Medium", now: Optional[float] = None) -> bool:
+    """True when a field is missing, below `min_confidence`, or older than `max_age` seconds."""
+    if is_missing(field.value, field.confidence):
+        return True
+    if CONFIDENCE_LEVELS.get(field.confidence, 0) < CONFIDENCE_LEVELS.get(min_confidence, 1):
+        return True
+    return (now or time.time()) - field.updated_at > max_age
+
+
+def seed_refresh_state(
+    previous: CompanyProfileState, max_age: float, min_confidence: str = "Medium"
+) -> Tuple[CompanyProfileState, List[str]]:
+    """Start a refresh from a previous result: only stale or low-confidence fields are researched again.
+
+    Stale fields keep their old value and confidence and are flagged `stale`, so the scheduler
+    picks them up; an answer replaces the old value only if it is at least as confident, so the
+    old value survives if nothing better is found. Derived fields follow their inputs.
+    """
+    now = time.time()
+    fields = {}
+    stale = []
+    for name, spec in ENRICHMENT_SCHEMA.items():
+        old = previous.fields.get(name, EnrichmentField())
+        fields[name] = EnrichmentField(value=old.value, confidence=old.confidence, source=old.source, updated_at=old.updated_at)
+        if not spec.get("derived") and needs_refresh(old, max_age, min_confidence, now):
+            fields[name].stale = not is_missing(old.value, old.confidence)
+            stale.append(name)
+    return CompanyProfileState(company_name=previous.company_name, fields=fields), stale
+
+
+def new_profile(company_name: str, schema: Dict[str, Dict] = ENRICHMENT_SCHEMA) -> CompanyProfileState:
+    return CompanyProfileState(company_name=company_name, fields={k: EnrichmentField() for k in schema})
+
+
+def split_evenly(total: int, parts: int) -> List[int]:
+    """Share `total` between `parts`, the first ones taking the remainder: split_evenly(5, 3) == [2, 2, 1]."""
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def _gathered(current: List[Tuple[int, str]], update: Optional[List[Tuple[int, str]]]) -> List[Tuple[int, str]]:
+    # The plan node writes None to start a round without the previous round's content
+    return [] if update is None else current + update
+
+
+@dataclass
+class ResearchRun:
+    """LangGraph state of one company's research: the profile plus round control (see ResearchPipeline.build_graph)."""
+    state: CompanyProfileState
+    max_rounds: int = 3
+    schema: Dict[str, Dict] = field(default_factory=lambda: ENRICHMENT_SCHEMA)
+    scheduler: Optional[FieldScheduler] = None
+    tracker: Optional[BudgetTracker] = None
+    generate_queries: bool = True
+    round_num: int = 0
+    # Field group -> queries from this round's single query-generation call
+    group_queries: Dict[str, List[str]] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+    before: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    finished: bool = False
+    # (group index, search content) written by the parallel search_group nodes of the current round
+    contents: Annotated[List[Tuple[int, str]], _gathered] = field(default_factory=list)
+
+
+@dataclass
+class ExtractionRequest:
+    """One company's extraction waiting to be packed into a batched request (see ResearchPipeline.extract_batched)."""
+    company_name: str
+    content: str
+    fields: Dict[str, EnrichmentField]
+    schema: Dict[str, Dict]
+    recheck: List[str]
+    context: str
+    done: asyncio.Future
+
+
 class ResearchPipeline:
-    def __init__(self, tavily_client: TavilyClient, azure_client: AsyncAzureOpenAI, deployment_name: str):
+    def __init__(
+        self,
+        tavily_client: Union[TavilyClient, SearchProvider],
+        azure_client: AsyncAzureOpenAI,
+        deployment_name: str,
+        tavily_concurrency: int = 5,
+        azure_concurrency: int = 4,
+        search_timeout: float = 20.0,
+        cache: Optional[SearchCache] = search_cache,
+        llm_cache: Optional[CompletionCache] = completion_cache,
+        deterministic: bool = False,
+        batch_size: int = 1,
+        batch_window: float = 0.2,
+        batch_token_budget: int = 12000,
+        context_token_budget: int = 3500,
+        field_patience: int = 2,
+        azure_limiter: Optional[RateLimiter] = None,
+        tavily_limiter: Optional[RateLimiter] = None,
+        stream_extraction: bool = False,
+        response_format: str = "json_object",
+        rule_extraction: bool = True,
+        budget: Optional[Budget] = None,
+    ):
         self.tavily = tavily_client
+        self.search_provider = as_search_provider(tavily_client)
         self.client = azure_client
         self.deployment = deployment_name
+        # Caps shared by every company researched through this pipeline instance
+        self.tavily_semaphore = asyncio.Semaphore(max(1, tavily_concurrency))
+        self.azure_semaphore = asyncio.Semaphore(max(1, azure_concurrency))
+        self.search_timeout = search_timeout
+        # Identical queries in flight for different companies share one Tavily request
+        self.search_flight = SingleFlight()
+        # Limiters throttle to quota and retry 429s/transient errors; pass shared ones to pool quota across pipelines
+        self.azure_limiter = azure_limiter or RateLimiter("azure")
+        self.tavily_limiter = tavily_limiter or RateLimiter("tavily")
+        self.completion_token_estimate = 800
+        self.stream_extraction = stream_extraction
+        # "json_schema" needs api-version 2024-08-01-preview or later; "json_object" works on older ones
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError(f"response_format must be one of {RESPONSE_FORMATS}")
+        self.response_format = response_format
+        self.parse_stats = ParseStats()
+        # Regex fast path for Kontak/Alamat/Jumlah Karyawan before the extraction prompt
+        self.rule_extraction = rule_extraction
+        # Default per-company budget; run_research(budget=...) overrides it
+        self.budget = budget
+        self.cache = cache
+        self.llm_cache = llm_cache
+        # Deterministic mode pins temperature to 0 so cached completions match a fresh call
+        self.temperature = 0 if deterministic else 1
+        # With batch_size > 1, companies reaching extraction within batch_window seconds of each other
+        # share one request (up to batch_size companies within the token budget) instead of streaming
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.batch_token_budget = batch_token_budget
+        self.batch_context_tokens = 1500
+        self._queued_extractions: List[ExtractionRequest] = []
+        self._queued_tokens = 0
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._extraction_tasks = set()
+        # Relevance-ranked snippets are packed into this many tokens per extraction prompt
+        self.context_token_budget = context_token_budget
+        # Fields with no yield in their last `field_patience` rounds stop getting queries
+        self.scheduler = FieldScheduler(ENRICHMENT_SCHEMA, patience=field_patience)
+        self._compiled_graph = None
+
+    def response_format_for(self, name: str, schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The response_format request parameter for the configured structured-output mode."""
+        if self.response_format == "json_schema":
+            return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+        if self.response_format == "json_object":
+            return {"type": "json_object"}
+        return None
 
-    async def generate_subqueries(self, company_name: str, missing_fields: List[str], round_num: int) -> List[str]:
+    def parse_json(self, content: str) -> Any:
+        return parse_json_lenient(content, self.parse_stats)
+
+    async def _create(self, prompt: str, response_format: Optional[Dict[str, Any]] = None, stream: bool = False):
+        """Send one chat request through the Azure limiter and concurrency cap."""
+        async def request():
+            options = {"response_format": response_format} if response_format else {}
+            async with self.azure_semaphore:
+                record("enrichment_api_calls_total", summary_key="llm_calls", api="azure")
+                return await self.client.chat.completions.create(
+                    model=self.deployment,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=self.temperature,
+                    stream=stream,
+                    **options
+                )
+
+        estimated_tokens = count_tokens(prompt) + self.completion_token_estimate
+        try:
+            response = await self.azure_limiter.call(request, tokens=estimated_tokens)
+        except BadRequestError as e:
+            if not response_format or "response_format" not in str(e):
+                raise
+            # Older api-versions/models reject structured output; fall back to prompt-only JSON
+            logger.warning(f"Deployment rejected response_format, disabling structured output: {e}")
+            self.response_format = "none"
+            return await self._create(prompt, None, stream)
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            self.azure_limiter.record_usage(estimated_tokens, usage.total_tokens)
+            record("enrichment_llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, "prompt_tokens", kind="prompt")
+            record("enrichment_llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, "completion_tokens", kind="completion")
+        return response
+
+    async def complete(
+        self,
+        prompt: str,
+        parse: Callable[[str], Any],
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        """Call the deployment (or the completion cache) and parse the content.
+
+        Malformed JSON gets one repair request instead of costing the whole round. Only
+        completions that parse are cached, so a retry after a bad response still reaches the model.
+        """
+        content = None
+        if self.llm_cache:
+            content = await self.llm_cache.aget_completion(self.deployment, prompt, self.temperature)
+        if content is not None:
+            logger.info("Completion cache hit")
+            record("enrichment_cache_requests_total", summary_key="completion_cache_hits", cache="completion", result="hit")
+            return parse(content)
+        record("enrichment_cache_requests_total", cache="completion", result="miss")
+
+        response = await self._create(prompt, response_format)
+        content = response.choices[0].message.content
+        if content is None:
+            raise ValueError("No content returned from LLM")
+
+        try:
+            parsed = parse(content)
+        except MalformedJSONError as e:
+            content = await self.repair_output(content, e)
+            parsed = parse(content)
+        if self.llm_cache:
+            await self.llm_cache.aset_completion(self.deployment, prompt, self.temperature, content)
+        return parsed
+
+    async def repair_output(self, content: str, error: Exception) -> str:
+        """Ask the model to rewrite malformed JSON output; much cheaper than redoing the round."""
+        self.parse_stats.count("llm_repairs")
+        logger.warning(f"Requesting JSON repair ({self.parse_stats.llm_repairs} so far): {error}")
+        prompt = f"""
+        The following output should be valid JSON but fails to parse ({error}).
+        Return the same data as valid JSON only, without explanations or code fences.
+
+        {content}
+        """
+        response_format = {"type": "json_object"} if self.response_format != "none" else None
+        response = await self._create(prompt, response_format)
+        return response.choices[0].message.content or ""
+
+    async def stream_completion(
+        self,
+        prompt: str,
+        parse: Callable[[str], Any],
+        response_format: Optional[Dict[str, Any]] = None,
+    ):
+        """Yield completion text as it arrives; a cached completion is yielded in one piece.
+
+        The full text is cached at the end only if `parse` accepts it, as in complete().
+        """
+        if self.llm_cache:
+            cached = await self.llm_cache.aget_completion(self.deployment, prompt, self.temperature)
+            if cached is not None:
+                logger.info("Completion cache hit")
+                record("enrichment_cache_requests_total", summary_key="completion_cache_hits", cache="completion", result="hit")
+                yield cached
+                return
+            record("enrichment_cache_requests_total", cache="completion", result="miss")
+
+        stream = await self._create(prompt, response_format, stream=True)
+        parts = []
+        async with self.azure_semaphore:
+            async for chunk in stream:
+                # Azure sends chunks without choices (e.g. content filter results)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+
+        content = "".join(parts)
+        # Streamed responses carry no usage block, so tokens are counted locally
+        record("enrichment_llm_tokens_total", count_tokens(prompt), "prompt_tokens", kind="prompt")
+        record("enrichment_llm_tokens_total", count_tokens(content), "completion_tokens", kind="completion")
+        if self.llm_cache:
+            try:
+                parse(content)
+            except Exception:
+                return
+            await self.llm_cache.aset_completion(self.deployment, prompt, self.temperature, content)
+
+    async def generate_grouped_queries(
+        self, company_name: str, groups: Dict[str, List[str]], round_num: int
+    ) -> Dict[str, List[str]]:
+        """Targeted queries for every field group from one completion: {"group": [queries]}."""
         prompt = f"""
         Target Company: {company_name}
-        Missing Fields: {', '.join(missing_fields)}
         Round: {round_num}
-       
-        Generate 3-5 specific search queries to find the missing information.
+        Missing fields by group: {json.dumps(groups, ensure_ascii=False)}
+
+        Generate 1-3 specific search queries per group to find that group's missing fields ({MAX_QUERIES_PER_ROUND} at most in total).
         If this is a later round, try different keywords or specific document types (e.g., 'Annual Report', 'LinkedIn', 'Contact Us page').
-        Return ONLY a JSON list of strings. Example: ["query1", "query2"]
+        Return ONLY a JSON object mapping every group name to a list of strings. Example: {{"{next(iter(groups))}": ["query1", "query2"]}}
         """
         try:
-            response = await self.client.chat.completions.create(
-                model=self.deployment,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=1
-            )
-            content = response.choices[0].message.content
-
-            if content is None:
-                raise ValueError("No content returned from LLM")
-           
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
-            return json.loads(content.strip())
+            with span("generate_queries"):
+                return await self.complete(
+                    prompt,
+                    lambda content: parse_grouped_queries(self.parse_json(content), company_name, groups),
+                    self.response_format_for("search_queries", grouped_queries_schema(list(groups))),
+                )
         except Exception as e:
             logger.warning(f"Failed to parse query JSON: {e}, using fallback")
-            return [f"{company_name} {field}" for field in missing_fields]
-       
+            return {group: fallback_queries(company_name, fields) for group, fields in groups.items()}
+
+    async def search_query(self, query: str) -> List[str]:
+        """Run one Tavily search under the pipeline's concurrency cap and timeout, using the shared cache."""
+        params = {
+            "search_depth": "basic",
+            "max_results": 3,
+            "include_raw_content": False,
+            "include_answer": True,
+        }
+        with span("search"):
+            result = await self.cache.aget_search(query, **params) if self.cache else None
+            if result is None:
+                record("enrichment_cache_requests_total", cache="search", result="miss")
+
+                async def request():
+                    async with self.tavily_semaphore:
+                        record("enrichment_api_calls_total", summary_key="search_calls", api="tavily")
+                        return await asyncio.wait_for(
+                            self.search_provider.search(query, **params),
+                            timeout=self.search_timeout,
+                        )
+
+                async def fetch():
+                    fetched = await self.tavily_limiter.call(request)
+                    if self.cache:
+                        await self.cache.aset_search(query, fetched, **params)
+                    return fetched
+
+                result = await self.search_flight.do(PersistentCache.make_key("tavily", query, **params), fetch)
+            else:
+                logger.info(f"Cache hit: {query}")
+                record("enrichment_cache_requests_total", summary_key="search_cache_hits", cache="search", result="hit")
+        snippets = []
+        for res in result.get("results", []):
+            snippet = res.get("content") or res.get("snippet", "")
+            snippets.append(f"Source: {res.get('url')}\nContent: {snippet[:500]}")
+        return snippets
+
+    @staticmethod
+    def unique_queries(queries: List[str], limit: int = MAX_QUERIES_PER_ROUND) -> List[str]:
+        # Deduplicate (case/whitespace-insensitive) while keeping order so prompts stay reproducible
+        unique: Dict[str, str] = {}
+        for query in queries:
+            unique.setdefault(normalize_query(query), query)
+        return list(unique.values())[:limit]
+
     async def perform_search(self, queries: List[str]) -> str:
-        """Perform Tavily search for a list of queries and aggregrate results."""
-        aggregrated_content = []
-       
-        # Deduplicate queries
-        unique_queries = list(set(queries))
+        """Perform Tavily search for a list of queries concurrently and aggregrate results."""
+        unique_queries = self.unique_queries(queries)
+        for query in unique_queries:
+            logger.info(f"Searching: {query}")
 
-        # Limit to 5 queries
-        for query in unique_queries[:5]:
-            try:
-                logger.info(f"Searching: {query}")
-                result = await asyncio.to_thread(
-                    self.tavily.search,
-                    query=query,
-                    search_depth="basic",
-                    max_results=3,
-                    include_raw_content=False,
-                    include_answer=True
-                )
-                for res in result.get("results", []):
-                    snippet = res.get("content") or res.get("snippet", "")
-                    aggregrated_content.append(f"Source: {res.get('url')}\nContent: {snippet[:500]}")
-            except Exception as e:
-                logger.error(f"Search failed for query '{query}': {e}")
+        results = await asyncio.gather(
+            *(self.search_query(query) for query in unique_queries),
+            return_exceptions=True,
+        )
+
+        aggregrated_content = []
+        for query, result in zip(unique_queries, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Search failed for query '{query}': {result!r}")
+                continue
+            aggregrated_content.extend(result)
 
         return "\n\n".join(aggregrated_content)
 
     async def perform_search_stream(self, queries: List[str]):
-        """Perform Tavily search and stream log messages."""
-        aggregrated_content = []
-
-        # Deduplicate queries
-        unique_queries = list(set(queries))
+        """Perform Tavily search concurrently and stream log messages as each query finishes.
 
-        # Limit to 5 queries
-        for query in unique_queries[:5]:
+        Closing the stream early (e.g. on a timeout) cancels the searches still in flight.
+        """
+        unique_queries = self.unique_queries(queries)
+        for query in unique_queries:
             yield ("log", f"Searching: {query}")
+
+        async def run(index: int, query: str):
             try:
-                result = await asyncio.to_thread(
-                    self.tavily.search,
-                    query=query,
-                    search_depth="basic",
-                    max_results=3,
-                    include_raw_content=False,
-                    include_answer=True
-                )
-                for res in result.get("results", []):
-                    snippet = res.get("content") or res.get("snippet", "")
-                    aggregrated_content.append(
-                        f"Source: {res.get('url')}\nContent: {snippet[:500]}"
-                    )
-                yield (
-                    "log",
-                    f"Search completed: {query} ({len(result.get('results', []))} results)",
-                )
+                return index, query, await self.search_query(query)
             except Exception as e:
-                yield ("log", f"Search failed for query '{query}': {e}")
+                return index, query, e
+
+        results: Dict[int, List[str]] = {}
+        tasks = [asyncio.create_task(run(i, q)) for i, q in enumerate(unique_queries)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, query, result = await next_done
+                if isinstance(result, Exception):
+                    yield ("log", f"Search failed for query '{query}': {result!r}")
+                    continue
+                results[index] = result
+                yield ("log", f"Search completed: {query} ({len(result)} results)")
+        finally:
+            for task in tasks:
+                task.cancel()
 
+        # Aggregate in query order, not completion order
+        aggregrated_content = [snippet for i in sorted(results) for snippet in results[i]]
         yield ("result", "\n\n".join(aggregrated_content))
-   
-    async def extract_and_evaluate(self, company_name: str, content: str, current_fields: Dict[str, EnrichmentField]) -> Dict[str, EnrichmentField]:
+
+    def apply_rules(self, company_name: str, content: str, current_fields: Dict[str, EnrichmentField]) -> List[str]:
+        """Fill pattern-matchable fields from the snippets at the rule's confidence and return their names.
+
+        High matches leave the extraction prompt; pass the Medium ones as `recheck` (see rule_rechecks).
+        """
+        if not self.rule_extraction:
+            return []
+        missing = [k for k, v in current_fields.items() if needs_search(v)]
+        matches = {
+            name: match for name, match in extract_with_rules(company_name, content, missing).items()
+            if replaces(current_fields[name], match.confidence)
+        }
+        for name, match in matches.items():
+            current_fields[name].update(match.value, match.confidence, match.source)
+        if matches:
+            logger.info(f"Matched by rules: {', '.join(matches)}")
+        return list(matches)
+
+    @staticmethod
+    def rule_rechecks(matched: List[str], current_fields: Dict[str, EnrichmentField]) -> List[str]:
+        """Rule matches the extraction should confirm: the ambiguous ones stored below High."""
+        return [name for name in matched if current_fields[name].confidence != "High"]
+
+    async def extract_and_evaluate(
+        self,
+        company_name: str,
+        content: str,
+        current_fields: Dict[str, EnrichmentField],
+        schema: Dict[str, Dict] = ENRICHMENT_SCHEMA,
+        recheck: Sequence[str] = (),
+    ) -> Dict[str, EnrichmentField]:
         """Extract information from search tool content and update fields."""
 
         # Identify fields that still need enrichment (Low confidence or 'Tidak Tersedia')
-        target_fields = [k for k, v in current_fields.items() if v.value == "Tidak Tersedia" or v.confidence == "Low"]
+        target_fields = extraction_targets(current_fields, schema, recheck)
         if not target_fields:
             return current_fields
+
+        try:
+            with span("extraction"):
+                extracted_data = await self.complete(
+                    self.extraction_prompt(company_name, content, target_fields, schema),
+                    self.parse_json,
+                    self.response_format_for("extraction", extraction_schema(target_fields, schema)),
+                )
+
+            apply_extraction(extracted_data, current_fields)
+        except Exception as e:
+            logger.error(f"Extraction failed: {e}")
+
+        return current_fields
+
+    async def extract_and_evaluate_stream(
+        self,
+        company_name: str,
+        content: str,
+        current_fields: Dict[str, EnrichmentField],
+        schema: Dict[str, Dict] = ENRICHMENT_SCHEMA,
+        recheck: Sequence[str] = (),
+    ):
+        """Streaming extract_and_evaluate: yields ("field", name, value, confidence) as soon as each field is parsed."""
+        target_fields = extraction_targets(current_fields, schema, recheck)
+        if not target_fields:
+            return
+
+        parser = IncrementalObjectParser()
+        parts = []
+        emitted = set()
+        start = time.perf_counter()
+        try:
+            async for delta in self.stream_completion(
+                self.extraction_prompt(company_name, content, target_fields, schema),
+                parse_json_content,
+                self.response_format_for("extraction", extraction_schema(target_fields, schema)),
+            ):
+                parts.append(delta)
+                for name, data in parser.feed(delta):
+                    emitted.add(name)
+                    for event in self._apply_streamed_field(name, data, current_fields):
+                        yield event
+
+            # Members the incremental parser could not read (e.g. truncated or malformed output)
+            text = "".join(parts)
+            try:
+                extracted_data = self.parse_json(text)
+            except MalformedJSONError as e:
+                extracted_data = self.parse_json(await self.repair_output(text, e))
+            for name, data in extracted_data.items():
+                if name not in emitted:
+                    for event in self._apply_streamed_field(name, data, current_fields):
+                        yield event
+        except Exception as e:
+            logger.error(f"Extraction failed: {e}")
+        finally:
+            record_stage("extraction", time.perf_counter() - start)
+
+    @staticmethod
+    def _apply_streamed_field(name: str, data: Any, current_fields: Dict[str, EnrichmentField]):
+        try:
+            updated = apply_extraction({name: data}, current_fields)
+        except Exception as e:
+            logger.warning(f"Invalid value for {name}: {e}")
+            return
+        if updated:
+            yield ("field", name, current_fields[name].value, current_fields[name].confidence)
+
+    def extraction_prompt(
+        self, company_name: str, content: str, target_fields: List[str], schema: Dict[str, Dict] = ENRICHMENT_SCHEMA
+    ) -> str:
+        schema_desc = {k: schema[k]["desc"] for k in target_fields}
        
-        schema_desc = {k: ENRICHMENT_SCHEMA[k]["desc"] for k in target_fields}
-       
-        prompt = f"""
+        return f"""
         You're a Data Extraction Specialist.
         Company: {company_name}
        
         Search results:
-        {content[:15000]} # Limit to first 15000 characters
+        {build_context(content, schema_desc, self.context_token_budget, company_name)}
 
         Task: Extract information for the following fields based on the search results.
         Fields to find: {json.dumps(schema_desc, indent=2)}
@@ -196,150 +819,377 @@ class ResearchPipeline:
         3. Return JSON format: {{ "Field Name": {{"value": "...", "confidence": "..."}} }}
         """
 
+    async def extract_batched(
+        self,
+        company_name: str,
+        content: str,
+        current_fields: Dict[str, EnrichmentField],
+        schema: Dict[str, Dict] = ENRICHMENT_SCHEMA,
+        recheck: Sequence[str] = (),
+    ) -> Dict[str, EnrichmentField]:
+        """extract_and_evaluate for concurrent runs: the call waits up to batch_window seconds so
+        other companies' extractions can share its request (up to batch_size within batch_token_budget).
+        """
+        target_fields = extraction_targets(current_fields, schema, recheck)
+        if not target_fields:
+            return current_fields
+        context = build_context(
+            content, {k: schema[k]["desc"] for k in target_fields}, self.batch_context_tokens, company_name
+        )
+        loop = asyncio.get_running_loop()
+        request = ExtractionRequest(company_name, content, current_fields, schema, list(recheck), context, loop.create_future())
+        cost = count_tokens(context)
+        # Company names key the batched answer, so a name already queued goes into the next batch
+        if any(queued.company_name == company_name for queued in self._queued_extractions) or (
+            self._queued_tokens + cost > self.batch_token_budget
+        ):
+            self._flush_extractions()
+        self._queued_extractions.append(request)
+        self._queued_tokens += cost
+        if len(self._queued_extractions) >= self.batch_size:
+            self._flush_extractions()
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.batch_window, self._flush_extractions)
+        # A cancelled wait (e.g. the time budget) cancels the future, and the batch then leaves these fields alone
+        await request.done
+        return current_fields
+
+    def _flush_extractions(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        batch, self._queued_extractions, self._queued_tokens = self._queued_extractions, [], 0
+        if batch:
+            # The shared request is counted in the metrics of the company whose call sent it
+            task = asyncio.create_task(self._extract_packed(batch))
+            self._extraction_tasks.add(task)
+            task.add_done_callback(self._extraction_tasks.discard)
+
+    async def _extract_single(self, request: ExtractionRequest):
+        # Into a copy: a company that stopped waiting (time budget) may already have saved its checkpoint
+        fields = copy.deepcopy(request.fields)
+        await self.extract_and_evaluate(request.company_name, request.content, fields, request.schema, request.recheck)
+        if not request.done.done():
+            request.fields.update(fields)
+
+    async def _extract_packed(self, batch: List[ExtractionRequest]):
         try:
-            response = await self.client.chat.completions.create(
-                model = self.deployment,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=1
+            batch = [request for request in batch if not request.done.done()]
+            if len(batch) == 1:
+                await self._extract_single(batch[0])
+                return
+            if not batch:
+                return
+
+            # Field descriptions are sent once for the whole batch, companies only list field names
+            targets = {
+                request.company_name: extraction_targets(request.fields, request.schema, request.recheck)
+                for request in batch
+            }
+            schema_desc = {k: request.schema[k]["desc"] for request in batch for k in targets[request.company_name]}
+            sections = "\n\n".join(
+                f"### Company: {request.company_name}\nFields to find: {', '.join(targets[request.company_name])}\n"
+                f"Search results:\n{request.context}"
+                for request in batch
             )
-            content_response = response.choices[0].message.content
-
-            if content_response is None:
-                raise ValueError("No content returned from LLM")
-
-            # parse response
-
-            if "```json" in content_response:
-                content_response = content_response.split("```json")[1].split("```")[0]
-            elif "```" in content_response:
-                content_response = content_response.split("```")[1].split("```")[0]
-           
-            extracted_data = json.loads(content_response.strip())
-
-            # Update state
-            for field, data in extracted_data.items():
-                if field in current_fields:
-                    # Only update if found something better
-                    if data.get("value") != "Tidak Tersedia":
-                        current_fields[field].value = data.get("value")
-                        current_fields[field].confidence = data.get("confidence")
-        except Exception as e:
-            logger.error(f"Extraction failed: {e}")
+            prompt = f"""
+            You're a Data Extraction Specialist.
 
-        return current_fields
-   
-    async def run_research(self, company_name: str, max_global_rounds: int = 3) -> CompanyProfileState:
-        fields = {k: EnrichmentField() for k in ENRICHMENT_SCHEMA.keys()}
-        state = CompanyProfileState(company_name=company_name, fields=fields)
+            Field definitions: {json.dumps(schema_desc, indent=2)}
 
-        logger.info(f"Starting research for {company_name}")
-        state.iteration_logs.append(f"INFO:backend.researcher:Starting research for {company_name}")
-       
-        for round_num in range(1, max_global_rounds + 1):
-            logger.info(f"--- Pencarian ke- {round_num} ---")
-            state.iteration_logs.append(f"INFO:backend.researcher:--- Pencarian ke- {round_num} ---")
-
-            # Identify missing fields
-            missing_fields = [
-                k for k, v in state.fields.items()
-                if (v.value == "Tidak Tersedia" or v.confidence == "Low")
-                and v.rounds_taken < ENRICHMENT_SCHEMA[k]["max_rounds"]
-            ]
-            if not missing_fields:
-                logger.info("All fields enriched or max rounds reached.")
-                state.iteration_logs.append("INFO:backend.researcher:All fields enriched or max rounds reached.")
-                break
-           
-            logger.info(f"Looking for: {', '.join(missing_fields)}")
-            state.iteration_logs.append(f"INFO:backend.researcher:Looking for: {', '.join(missing_fields)}")
-
-            # Generate Queries
-            queries = await self.generate_subqueries(company_name, missing_fields, round_num)
-            logger.info(f"Generated Queries: {queries}")
-            state.iteration_logs.append(f"INFO:backend.researcher:Generated Queries: {queries}")
-
-            # Perform Search
-            content = await self.perform_search(queries)
-            if not content or content == "No search results available":
-                logger.info("No new information found in search.")
-                state.iteration_logs.append("INFO:backend.researcher:No new information found in search.")
-                continue
-           
-            # Extract and Evaluate
-            state.fields = await self.extract_and_evaluate(company_name, content, state.fields)
+            {sections}
+
+            Task: For every company above, extract its listed fields using only that company's search results.
+
+            Instructions:
+            1. If found, extract the value concisely.
+            2. Assign a confidence level: 'High (explicitly found), 'Medium' (inferred)', 'Low' (not found/uncertain).
+            3. Return JSON format: {{ "Company Name": {{ "Field Name": {{"value": "...", "confidence": "..."}} }} }}
+            """
+
+            batch_schema = {
+                "type": "object",
+                "properties": {
+                    request.company_name: extraction_schema(targets[request.company_name], request.schema)
+                    for request in batch
+                },
+                "required": list(targets),
+                "additionalProperties": False,
+            }
+            try:
+                with span("extraction"):
+                    extracted_data = await self.complete(
+                        prompt, self.parse_json, self.response_format_for("batch_extraction", batch_schema)
+                    )
+            except Exception as e:
+                logger.warning(f"Batched extraction failed: {e}, falling back to single-company calls")
+                extracted_data = {}
+
+            fallback = []
+            for request in batch:
+                if request.done.done():
+                    continue
+                company_data = extracted_data.get(request.company_name) if isinstance(extracted_data, dict) else None
+                if isinstance(company_data, dict):
+                    apply_extraction(company_data, request.fields)
+                    continue
+                logger.warning(f"No batched result for {request.company_name}, extracting it on its own")
+                fallback.append(self._extract_single(request))
+            await asyncio.gather(*fallback)
+        finally:
+            for request in batch:
+                if not request.done.done():
+                    request.done.set_result(None)
+
+    # Research graph: plan -> queries -> search_group (one node per field group, run in parallel) -> extract -> plan ...
+
+    @staticmethod
+    def _emit(state: CompanyProfileState, *event: Any):
+        """Write an event to the graph's custom stream; log messages are also kept on the state."""
+        if event[0] == "log":
+            state.iteration_logs.append(event[1])
+            logger.info(event[1])
+        get_stream_writer()(event)
+
+    async def _plan_round(self, run: ResearchRun) -> Dict[str, Any]:
+        """Round control: pick the fields still worth searching, or finish the run."""
+        state = run.state
+        round_num = state.rounds_completed + 1
+        if round_num > run.max_rounds:
+            return {"finished": True}
+        self._emit(state, "log", f"Starting search round {round_num}")
+
+        # Identify missing fields that are still worth a round
+        missing = run.scheduler.due_fields(state.fields)
+        run.scheduler.record_skipped(state.schedule_stats, state.fields, missing, run.max_rounds - round_num + 1)
+        if not missing:
+            self._emit(state, "log", "All fields enriched or no longer yielding")
+            return {"finished": True}
+        state.budget_exhausted = run.tracker.exhausted() or ""
+        if state.budget_exhausted:
+            self._emit(state, "log", f"Budget exhausted ({state.budget_exhausted}), keeping fields found so far")
+            return {"finished": True}
+
+        self._emit(state, "log", f"Looking for: {', '.join(missing)}")
+        run.tracker.start_round()
+        return {
+            "round_num": round_num,
+            "missing": missing,
+            "before": run.scheduler.snapshot(state.fields),
+            "contents": None,
+        }
+
+    def _out_of_time(self, run: ResearchRun, skipped: str):
+        """Record that the time budget ran out inside the round; the next plan step ends the run."""
+        run.state.budget_exhausted = run.tracker.exhausted() or "time budget"
+        self._emit(run.state, "log", f"Budget exhausted ({run.state.budget_exhausted}), {skipped}")
+
+    @staticmethod
+    def _route_round(run: ResearchRun):
+        return END if run.finished else "queries"
+
+    async def _generate_queries(self, run: ResearchRun) -> Dict[str, Any]:
+        """One query-generation call for all field groups of the round (templated queries when disabled)."""
+        groups = run.scheduler.group(run.missing)
+        if not run.generate_queries:
+            return {"group_queries": {group: fallback_queries(run.state.company_name, fields) for group, fields in groups.items()}}
+        left = run.tracker.seconds_left()
+        if left is not None and left <= 0:
+            self._out_of_time(run, "skipping the search")
+            return {"group_queries": {}}
+        try:
+            async with asyncio.timeout(left):
+                group_queries = await self.generate_grouped_queries(run.state.company_name, groups, run.round_num)
+        except TimeoutError:
+            self._out_of_time(run, "skipping the search")
+            return {"group_queries": {}}
+        return {"group_queries": group_queries}
+
+    def _route_groups(self, run: ResearchRun):
+        """Fan out one search_group node per field group, splitting the round's search quota between them."""
+        groups = list(run.group_queries.items())
+        if not groups:
+            return "extract"
+        quotas = split_evenly(max(MAX_QUERIES_PER_ROUND, len(groups)), len(groups))
+        left = run.tracker.searches_left()
+        if left is not None:
+            quotas = [min(q, allowed) for q, allowed in zip(quotas, split_evenly(left, len(groups)))]
+        return [
+            Send("search_group", {"run": run, "index": i, "group": group, "queries": queries, "quota": quota})
+            for i, ((group, queries), quota) in enumerate(zip(groups, quotas))
+        ]
+
+    async def _search_group(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Search one field group's queries; the round's groups run concurrently."""
+        run: ResearchRun = task["run"]
+        state = run.state
+        if task["quota"] <= 0:
+            return {"contents": []}
+        queries = self.unique_queries(task["queries"], task["quota"])
+        self._emit(state, "log", f"Generated queries for {task['group']}: {queries}")
+
+        content = ""
+        try:
+            # Cut off at the time budget; searches still in flight are cancelled
+            async with asyncio.timeout(run.tracker.seconds_left()):
+                async for event_type, payload in self.perform_search_stream(queries):
+                    if event_type == "log":
+                        self._emit(state, "log", payload)
+                    else:
+                        content = payload
+        except TimeoutError:
+            self._out_of_time(run, f"stopped searching for {task['group']}")
+        return {"contents": [(task["index"], content)]}
+
+    async def _extract_round(self, run: ResearchRun) -> Dict[str, Any]:
+        """Join the groups' search content, fill fields (rules, one extraction, derived) and close the round."""
+        state = run.state
+        # Group order, not completion order, so prompts (and cached completions) are reproducible
+        content = "\n\n".join(text for _, text in sorted(run.contents) if text)
+        if not content:
+            self._emit(state, "log", "No new information found in search.")
+        else:
+            matched = self.apply_rules(state.company_name, content, state.fields)
+            if matched:
+                self._emit(state, "log", f"Matched by rules: {', '.join(matched)}")
+                for name in matched:
+                    self._emit(state, "field", name, state.fields[name].value, state.fields[name].confidence)
+            recheck = self.rule_rechecks(matched, state.fields)
+            left = run.tracker.seconds_left()
+            if left is not None and left <= 0:
+                self._out_of_time(run, "skipping extraction")
+            else:
+                self._emit(state, "log", "Extracting data from search results")
+                before = run.scheduler.snapshot(state.fields)
+                try:
+                    # Fields parsed before the time budget runs out are kept
+                    async with asyncio.timeout(left):
+                        if self.batch_size > 1:
+                            await self.extract_batched(state.company_name, content, state.fields, run.schema, recheck)
+                        elif self.stream_extraction:
+                            async for event in self.extract_and_evaluate_stream(
+                                state.company_name, content, state.fields, run.schema, recheck
+                            ):
+                                self._emit(state, *event)
+                                before[event[1]] = (event[2], event[3])
+                        else:
+                            await self.extract_and_evaluate(state.company_name, content, state.fields, run.schema, recheck)
+                except TimeoutError:
+                    self._out_of_time(run, "stopped extraction")
+                for name, field_state in state.fields.items():
+                    if (field_state.value, field_state.confidence) != before[name]:
+                        self._emit(state, "field", name, field_state.value, field_state.confidence)
+            for name in apply_derived(state.fields):
+                self._emit(state, "field", name, state.fields[name].value, state.fields[name].confidence)
+            self._emit(state, "log", f"Extraction round {run.round_num} completed")
 
             # Update rounds count for checked fields
-            for f in missing_fields:
+            for f in run.missing:
                 state.fields[f].rounds_taken += 1
 
+        stalled = run.scheduler.record_round(state.fields, run.missing, run.before)
+        if stalled:
+            self._emit(state, "log", f"No yield, stop searching: {', '.join(stalled)}")
+        record_stage("round", run.tracker.end_round())
+        state.rounds_completed = run.round_num
+        # A copy, so the next round cannot change the checkpoint while the consumer saves it
+        self._emit(state, "checkpoint", copy.deepcopy(state))
+        return {}
+
+    def build_graph(self):
+        """Build and compile the research graph (compiled once per pipeline and reused)."""
+        if self._compiled_graph is not None:
+            return self._compiled_graph
+        graph = StateGraph(ResearchRun)
+        graph.add_node("plan", self._plan_round)
+        graph.add_node("queries", self._generate_queries)
+        graph.add_node("search_group", self._search_group)
+        graph.add_node("extract", self._extract_round)
+        graph.add_edge(START, "plan")
+        graph.add_conditional_edges("plan", self._route_round, ["queries", END])
+        graph.add_conditional_edges("queries", self._route_groups, ["search_group", "extract"])
+        graph.add_edge("search_group", "extract")
+        graph.add_edge("extract", "plan")
+        self._compiled_graph = graph.compile()
+        return self._compiled_graph
+
+    async def run_research(
+        self,
+        company_name: str,
+        max_global_rounds: int = 3,
+        state: Optional[CompanyProfileState] = None,
+        on_round: Optional[Callable[[CompanyProfileState], Awaitable[None]]] = None,
+        budget: Optional[Budget] = None,
+        job_budget: Optional[JobBudget] = None,
+        schema: Optional[Dict[str, Dict]] = None,
+        generate_queries: bool = True,
+    ) -> CompanyProfileState:
+        """Research a company, optionally resuming from a checkpointed state.
+
+        `on_round` is awaited after every completed round so callers can persist progress.
+        When the company `budget` (default: the pipeline's) or the shared `job_budget` runs
+        out, no further rounds start and `state.budget_exhausted` says why.
+        """
+        if state is None:
+            state = new_profile(company_name, schema or ENRICHMENT_SCHEMA)
+        with company_summary(state.metrics):
+            events = self.run_research_stream(
+                company_name, max_global_rounds, state, budget, job_budget, schema, generate_queries
+            )
+            async with aclosing(events):
+                async for event in events:
+                    if event[0] == "checkpoint" and on_round is not None:
+                        await on_round(event[1])
         return state
 
     async def run_research_stream(
-        self, company_name: str, max_global_rounds: int = 3
+        self,
+        company_name: str,
+        max_global_rounds: int = 3,
+        state: Optional[CompanyProfileState] = None,
+        budget: Optional[Budget] = None,
+        job_budget: Optional[JobBudget] = None,
+        schema: Optional[Dict[str, Dict]] = None,
+        generate_queries: bool = True,
     ):
-        fields = {k: EnrichmentField() for k in ENRICHMENT_SCHEMA.keys()}
-        state = CompanyProfileState(company_name=company_name, fields=fields)
+        """Stream ("log", message) events, a ("checkpoint", state) after every round and a final ("result", state).
+
+        ("field", name, value, confidence) events are emitted as fields fill, while the
+        extraction completion is still arriving when stream_extraction is enabled. `schema`
+        restricts or extends the researched fields (default ENRICHMENT_SCHEMA); with
+        `generate_queries=False` each field gets one templated query instead of an LLM call.
+        Budgets work as in run_research.
+        """
+        schema = schema or ENRICHMENT_SCHEMA
+        if state is None:
+            state = new_profile(company_name, schema)
+            log_message = f"Starting research for {company_name}"
+        elif state.rounds_completed == 0:
+            log_message = f"Refreshing: {', '.join(extraction_targets(state.fields, schema)) or 'nothing stale'}"
+        else:
+            log_message = f"Resuming research after round {state.rounds_completed}"
+        bind_summary(state.metrics)
+        state.budget_exhausted = ""
 
-        log_message = "Starting research"
         state.iteration_logs.append(log_message)
         yield ("log", log_message)
+        # Inputs of derived fields may already be known (refresh, per-cell context values)
+        for name in apply_derived(state.fields):
+            yield ("field", name, state.fields[name].value, state.fields[name].confidence)
 
-        for round_num in range(1, max_global_rounds + 1):
-            log_message = f"Starting search round {round_num}"
-            state.iteration_logs.append(log_message)
-            yield ("log", log_message)
-
-            # Identify missing fields
-            missing_fields = [
-                k for k, v in state.fields.items()
-                if (v.value == "Tidak Tersedia" or v.confidence == "Low")
-                and v.rounds_taken < ENRICHMENT_SCHEMA[k]["max_rounds"]
-            ]
-            if not missing_fields:
-                log_message = "All fields enriched"
-                state.iteration_logs.append(log_message)
-                yield ("log", log_message)
-                break
-
-            log_message = f"Looking for: {', '.join(missing_fields)}"
-            state.iteration_logs.append(log_message)
-            yield ("log", log_message)
-
-            # Generate Queries
-            log_message = "Generating search queries"
-            state.iteration_logs.append(log_message)
-            yield ("log", log_message)
-            queries = await self.generate_subqueries(company_name, missing_fields, round_num)
-            log_message = f"Generated queries: {queries}"
-            state.iteration_logs.append(log_message)
-            yield ("log", log_message)
-
-            # Perform Search
-            content = ""
-            async for event_type, payload in self.perform_search_stream(queries):
-                if event_type == "log":
-                    state.iteration_logs.append(payload)
-                    yield ("log", payload)
-                elif event_type == "result":
-                    content = payload
-
-            if not content or content == "No search results available":
-                log_message = "No new information found in search."
-                state.iteration_logs.append(log_message)
-                yield ("log", log_message)
-                continue
-
-            # Extract and Evaluate
-            log_message = "Extracting data from search results"
-            state.iteration_logs.append(log_message)
-            yield ("log", log_message)
-            state.fields = await self.extract_and_evaluate(company_name, content, state.fields)
-            log_message = f"Extraction round {round_num} completed"
-            state.iteration_logs.append(log_message)
-            yield ("log", log_message)
-
-            # Update rounds count for checked fields
-            for f in missing_fields:
-                state.fields[f].rounds_taken += 1
+        run = ResearchRun(
+            state=state,
+            max_rounds=max_global_rounds,
+            schema=schema,
+            scheduler=self.scheduler if schema is ENRICHMENT_SCHEMA else FieldScheduler(schema, self.scheduler.patience),
+            tracker=BudgetTracker(state.metrics, budget or self.budget, job_budget),
+            generate_queries=generate_queries,
+        )
+        # Every round takes four graph steps (plan, queries, search groups, extract)
+        config = {"recursion_limit": 4 * max_global_rounds + 5}
+        events = self.build_graph().astream(run, config=config, stream_mode="custom")
+        async with aclosing(events):
+            async for event in events:
+                yield event
 
         yield ("result", state)
@@ -0,0 +1,185 @@
+"""Pattern-based extraction for fields that do not need the LLM.
+
+Emails/phone numbers, employee counts and Indonesian street addresses follow
+recognisable patterns, so they are matched directly in the search snippets. Unambiguous
+matches (an email plus a phone number, the head-office address) are stored at High and
+leave the extraction prompt. The rest (employee counts, one of several addresses) are
+stored at Medium and re-checked by the same round's extraction, so the LLM can still
+correct a false positive; either way the field needs no further search rounds.
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from backend.context import Snippet, parse_snippets
+
+logger = logging.getLogger(__name__)
+
+EMAIL_PATTERN = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}\b")
+# +62 / 62 / 0 prefix or an area code in brackets, e.g. "(021) 5795 6789", "+62 812-3456-7890"
+PHONE_PATTERN = re.compile(r"(?<![\w+(])(?:\+62|62|0|\(0\d{1,3}\))(?:[\s.-]?\(?\d{2,5}\)?){2,4}(?!\d)")
+# Registration numbers that look like phone numbers (NIB, NPWP, licences, deeds)
+NOT_PHONE_CONTEXT = re.compile(r"\b(?:nib|npwp|siup|tdp|izin|ijin|licen[cs]e|lisensi|registrasi|registration|akta|sk|no\.?\s*reg)\b", re.I)
+NUMBER = r"\d{1,3}(?:[.,]\d{3})+|\d+"
+EMPLOYEE_PATTERNS = [
+    # "1.500 karyawan", "201-500 employees", "5 ribu pegawai"
+    re.compile(
+        rf"(?P<low>{NUMBER})(?:\s*(?:-|–|sampai|hingga|to)\s*(?P<high>{NUMBER}))?\s*(?P<ribu>ribu|rb)?\+?\s*"
+        r"(?:orang\s+)?(?:karyawan|pegawai|pekerja|employees|staff)\b",
+        re.I,
+    ),
+    # "jumlah karyawan: 1.500", "karyawan sebanyak 1500 orang"
+    re.compile(
+        rf"(?:jumlah|total)?\s*(?:karyawan|pegawai|employees)\s*(?:sebanyak|mencapai|:|of)\s*"
+        rf"(?P<low>{NUMBER})(?:\s*(?:-|–|sampai|hingga|to)\s*(?P<high>{NUMBER}))?\s*(?P<ribu>ribu|rb)?",
+        re.I,
+    ),
+]
+YEAR_PATTERN = re.compile(r"(?:19|20)\d{2}")
+CITIES = (
+    "Jakarta", "Bandung", "Surabaya", "Medan", "Semarang", "Makassar", "Palembang", "Tangerang", "Bekasi",
+    "Depok", "Bogor", "Batam", "Denpasar", "Badung", "Yogyakarta", "Sleman", "Malang", "Surakarta", "Solo",
+    "Balikpapan", "Samarinda", "Pekanbaru", "Banjarmasin", "Pontianak", "Manado", "Padang", "Cikarang",
+    "Karawang", "Sidoarjo", "Gresik", "Cirebon", "Serang", "Cilegon", "Jambi", "Lampung", "Kupang", "Jayapura",
+)
+CITY = r"(?:" + "|".join(CITIES) + r"|Kota\s+[A-Z]\w+|Kab(?:upaten|\.)\s*[A-Z]\w+)"
+PROVINCE = (
+    r"(?:DKI\s+Jakarta|Jawa\s+(?:Barat|Tengah|Timur)|Banten|Bali|D\.?I\.?\s*Yogyakarta|"
+    r"(?:Sumatera|Sumatra|Kalimantan|Sulawesi|Nusa\s+Tenggara)\s+\w+|Riau|Kepulauan\s+Riau|Lampung|Papua|Maluku)"
+)
+# A postcode counts only right after a city (and optional direction/province) or "Kode Pos"
+POSTCODE = (
+    rf"(?:{CITY}(?:,?\s+(?:Selatan|Utara|Barat|Timur|Pusat|Tengah))?(?:,?\s+{PROVINCE})?,?\s+"
+    r"|Kode\s*Pos\.?\s*:?\s*)[1-9]\d{4}\b"
+)
+ADDRESS_PATTERN = re.compile(
+    rf"\b(?:Jl\.?|Jln\.?|Jalan|Gedung|Gd\.|Menara|Wisma)\s[^\n]{{5,200}}?{POSTCODE}"
+)
+HEAD_OFFICE_PATTERN = re.compile(r"kantor pusat|head office|headquarter", re.I)
+IGNORED_EMAIL_DOMAINS = ("example.com", "sentry.io", "wixpress.com")
+IGNORED_EMAIL_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg")
+LEGAL_FORMS = {"pt", "tbk", "cv", "persero", "perseroan", "terbatas", "ud", "pd"}
+
+
+@dataclass
+class RuleMatch:
+    value: str
+    source: str
+    # High: precise enough to skip the LLM; Medium: re-checked by the extraction
+    confidence: str = "Medium"
+
+
+def company_tokens(company_name: str) -> List[str]:
+    """Distinctive words of a company name, without legal forms like PT/Tbk."""
+    words = re.findall(r"\w+", company_name.lower())
+    return [w for w in words if w not in LEGAL_FORMS and len(w) > 2]
+
+
+def relevant_snippets(company_name: str, snippets: List[Snippet]) -> List[Snippet]:
+    """Snippets that mention the company (in the URL or the text), so other companies' contacts are skipped."""
+    tokens = company_tokens(company_name)
+    if not tokens:
+        return snippets
+    phrase = " ".join(tokens)
+    return [
+        s for s in snippets
+        if any(t in s.url.lower() for t in tokens) or phrase in " ".join(re.findall(r"\w+", s.content.lower()))
+    ]
+
+
+def _to_int(number: str, ribu: Optional[str]) -> int:
+    value = int(re.sub(r"[.,]", "", number))
+    return value * 1000 if ribu else value
+
+
+def is_phone_number(text: str) -> bool:
+    """Indonesian mobile (08xx, 10-13 digits) or landline (0 + area code 2-7/9, 9-11 digits) number."""
+    digits = re.sub(r"\D", "", text)
+    if digits.startswith("62"):
+        digits = "0" + digits[2:]
+    if digits.startswith("08"):
+        return 10 <= len(digits) <= 13
+    if re.match(r"0[2-79]", digits):
+        return 9 <= len(digits) <= 11
+    return False
+
+
+def match_contact(snippets: List[Snippet]) -> Optional[RuleMatch]:
+    email = phone = None
+    for snippet in snippets:
+        if email is None:
+            for candidate in EMAIL_PATTERN.findall(snippet.content):
+                lowered = candidate.lower()
+                if not lowered.endswith(IGNORED_EMAIL_SUFFIXES) and not lowered.endswith(IGNORED_EMAIL_DOMAINS):
+                    email = (candidate, snippet.url)
+                    break
+        if phone is None:
+            for found in PHONE_PATTERN.finditer(snippet.content):
+                window = snippet.content[max(0, found.start() - 30):found.start()]
+                if is_phone_number(found.group(0)) and not NOT_PHONE_CONTEXT.search(window):
+                    phone = (" ".join(found.group(0).split()), snippet.url)
+                    break
+    # Both are needed for the field; otherwise the LLM keeps looking
+    if email is None or phone is None:
+        return None
+    return RuleMatch(value=f"{email[0]}, {phone[0]}", source=email[1] or phone[1], confidence="High")
+
+
+def match_employees(snippets: List[Snippet]) -> Optional[RuleMatch]:
+    values = {}
+    for snippet in snippets:
+        for pattern in EMPLOYEE_PATTERNS:
+            for found in pattern.finditer(snippet.content):
+                # "2024 karyawan baru" is a year, not a head count
+                if not found.group("ribu") and any(
+                    YEAR_PATTERN.fullmatch(n or "") for n in (found.group("low"), found.group("high"))
+                ):
+                    continue
+                low = _to_int(found.group("low"), found.group("ribu"))
+                high = found.group("high")
+                value = f"{low}-{_to_int(high, found.group('ribu'))}" if high else str(low)
+                values.setdefault(value, snippet.url)
+    # Conflicting counts (e.g. different years) are left to the LLM
+    if len(values) != 1:
+        return None
+    value, source = next(iter(values.items()))
+    return RuleMatch(value=value, source=source)
+
+
+def match_address(snippets: List[Snippet]) -> Optional[RuleMatch]:
+    found_addresses: Dict[str, str] = {}
+    for snippet in snippets:
+        for found in ADDRESS_PATTERN.finditer(snippet.content):
+            address = " ".join(found.group(0).split())
+            # Prefer an address near "kantor pusat"/"head office" over branch addresses
+            window = snippet.content[max(0, found.start() - 100):found.start()]
+            if HEAD_OFFICE_PATTERN.search(window):
+                return RuleMatch(value=address, source=snippet.url, confidence="High")
+            found_addresses.setdefault(address, snippet.url)
+    if not found_addresses:
+        return None
+    address, source = next(iter(found_addresses.items()))
+    # With several candidates the first may be a branch, so the LLM re-checks it
+    return RuleMatch(value=address, source=source, confidence="High" if len(found_addresses) == 1 else "Medium")
+
+
+RULES: Dict[str, Callable[[List[Snippet]], Optional[RuleMatch]]] = {
+    "Kontak": match_contact,
+    "Jumlah Karyawan": match_employees,
+    "Alamat": match_address,
+}
+
+
+def extract_with_rules(company_name: str, content: str, field_names: List[str]) -> Dict[str, RuleMatch]:
+    """Match the rule-based fields among `field_names` in aggregated search content."""
+    targets = [name for name in field_names if name in RULES]
+    if not targets:
+        return {}
+    snippets = relevant_snippets(company_name, parse_snippets(content))
+    matches = {}
+    for name in targets:
+        match = RULES[name](snippets)
+        if match is not None:
+            matches[name] = match
+    return matches
@@ -0,0 +1,68 @@
+import logging
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Estimated calls spent by one full round: 1 query generation + up to 5 searches + 1 extraction
+CALLS_PER_ROUND = 7
+
+
+def is_missing(value: str, confidence: str) -> bool:
+    return value == "Tidak Tersedia" or confidence == "Low"
+
+
+class FieldScheduler:
+    """Decides which fields are worth another search round and how to batch their queries.
+
+    A field is due while it is missing (or stale, when refreshing), below its schema `max_rounds`, and its last
+    `patience` attempted rounds were not all empty; derived fields are never due.
+    Fields are grouped by the schema `group` key so each group gets its own targeted queries.
+    """
+
+    def __init__(self, schema: Dict[str, Dict], patience: int = 2):
+        self.schema = schema
+        self.patience = max(1, patience)
+
+    def candidate_fields(self, fields) -> List[str]:
+        """Fields the plain round loop would still query (missing and under max_rounds, not derived)."""
+        return [
+            k for k, v in fields.items()
+            if (is_missing(v.value, v.confidence) or getattr(v, "stale", False))
+            and v.rounds_taken < self.schema[k]["max_rounds"]
+            and not self.schema[k].get("derived")
+        ]
+
+    def due_fields(self, fields) -> List[str]:
+        return [k for k in self.candidate_fields(fields) if fields[k].stalled_rounds < self.patience]
+
+    def group(self, field_names: List[str]) -> Dict[str, List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for name in field_names:
+            groups.setdefault(self.schema[name].get("group", name), []).append(name)
+        return groups
+
+    @staticmethod
+    def snapshot(fields) -> Dict[str, Tuple[str, str]]:
+        return {k: (v.value, v.confidence) for k, v in fields.items()}
+
+    def record_round(self, fields, attempted: List[str], before: Dict[str, Tuple[str, str]]) -> List[str]:
+        """Update per-field yield after a round and return the fields that just stalled."""
+        stalled = []
+        for name in attempted:
+            field = fields[name]
+            if (field.value, field.confidence) != before[name]:
+                field.stalled_rounds = 0
+                continue
+            field.stalled_rounds += 1
+            if field.stalled_rounds == self.patience:
+                stalled.append(name)
+        return stalled
+
+    def record_skipped(self, stats: Dict[str, int], fields, due: List[str], rounds_left: int):
+        """Count work the scheduler avoided compared to the plain round loop."""
+        skipped = [k for k in self.candidate_fields(fields) if k not in due]
+        stats["field_rounds_skipped"] = stats.get("field_rounds_skipped", 0) + len(skipped)
+        if skipped and not due:
+            # The plain loop would have kept running full rounds for these fields
+            stats["rounds_saved"] = stats.get("rounds_saved", 0) + rounds_left
+            stats["calls_saved"] = stats.get("calls_saved", 0) + rounds_left * CALLS_PER_ROUND
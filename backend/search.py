@@ -0,0 +1,85 @@
+import asyncio
+import inspect
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class SearchProvider(ABC):
+    """Async web search backend used by ResearchPipeline and EnrichmentPipeline."""
+
+    @abstractmethod
+    async def search(self, query: str, **params: Any) -> Dict:
+        pass
+
+    async def close(self):
+        """Release pooled connections owned by the provider."""
+
+
+class AsyncTavilySearchProvider(SearchProvider):
+    """Runs searches on the event loop through AsyncTavilyClient's pooled httpx client."""
+
+    def __init__(self, client, http_client=None):
+        self.client = client
+        self.http_client = http_client
+
+    async def search(self, query: str, **params: Any) -> Dict:
+        return await self.client.search(query=query, **params)
+
+    async def close(self):
+        if self.http_client is not None:
+            await self.http_client.aclose()
+
+
+class ThreadedTavilySearchProvider(SearchProvider):
+    """Fallback for the blocking TavilyClient: each call is handed to the default thread pool."""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def search(self, query: str, **params: Any) -> Dict:
+        return await asyncio.to_thread(self.client.search, query=query, **params)
+
+
+def as_search_provider(client) -> SearchProvider:
+    """Wrap a TavilyClient, AsyncTavilyClient or existing SearchProvider in the provider interface."""
+    if isinstance(client, SearchProvider):
+        return client
+    if inspect.iscoroutinefunction(getattr(client, "search", None)):
+        return AsyncTavilySearchProvider(client)
+    logger.info("Using thread-pool search provider for a blocking Tavily client")
+    return ThreadedTavilySearchProvider(client)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one request shared by every caller.
+
+    The request runs as its own task, so a cancelled caller (e.g. a cancelled job) does not
+    cancel it for the other companies waiting on the same query.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.joined = 0
+
+    async def do(self, key: str, request: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(request())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.started += 1
+        else:
+            self.joined += 1
+            logger.info(f"Joined in-flight request ({self.joined} so far)")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the error as retrieved when every caller was cancelled before it finished
+        if not task.cancelled():
+            task.exception()
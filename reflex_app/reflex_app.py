@@ -1,7 +1,11 @@
 import reflex as rx
 from typing import cast, Any
 from reflex.style import set_color_mode, color_mode
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
 from .state import State
+from backend.metrics import render_prometheus
 
 
 def dark_mode_toggle() -> rx.Component:
@@ -193,6 +197,25 @@ def main_content():
                 rx.box(
                     rx.text(State.status_log, size="2", margin_bottom="0.5rem"),
                     rx.progress(value=State.progress, width="100%"),
+                    rx.hstack(
+                        rx.button(
+                            "Pause",
+                            on_click=cast(rx.EventHandler[[]], State.pause_enrichment),
+                            variant="soft",
+                            size="1",
+                            cursor="pointer",
+                        ),
+                        rx.button(
+                            "Cancel",
+                            on_click=cast(rx.EventHandler[[]], State.cancel_enrichment),
+                            variant="soft",
+                            color_scheme="red",
+                            size="1",
+                            cursor="pointer",
+                        ),
+                        spacing="2",
+                        margin_top="0.5rem",
+                    ),
                     width="100%",
                     padding_y="1rem",
                 ),
@@ -217,7 +240,7 @@ def main_content():
                     ),
                     rx.table.body(
                         rx.foreach(
-                            State.companies,
+                            State.page_rows,
                             lambda company, i: table_row(company, i),
                         ),
                     ),
@@ -228,6 +251,29 @@ def main_content():
                 width="100%",
                 border_radius="md",
             ),
+            rx.hstack(
+                rx.text(State.page_label, size="2"),
+                rx.spacer(),
+                rx.button(
+                    rx.icon(tag="chevron-left", size=16),
+                    on_click=cast(rx.EventHandler[[]], State.prev_page),
+                    variant="soft",
+                    size="1",
+                    cursor="pointer",
+                    disabled=State.page == 0,
+                ),
+                rx.button(
+                    rx.icon(tag="chevron-right", size=16),
+                    on_click=cast(rx.EventHandler[[]], State.next_page),
+                    variant="soft",
+                    size="1",
+                    cursor="pointer",
+                    disabled=State.page + 1 >= State.page_count,
+                ),
+                width="100%",
+                align_items="center",
+                margin_top="0.5rem",
+            ),
 
             # ===== NEW: Action Bar PINDAH KE BAWAH =====
             rx.hstack(
@@ -244,6 +290,19 @@ def main_content():
                     color_scheme="jade",
                     cursor="pointer",
                 ),
+                rx.button(
+                    "Resume Job",
+                    on_click=cast(rx.EventHandler[[]], State.resume_enrichment),
+                    variant="outline",
+                    cursor="pointer",
+                    disabled=State.is_processing,
+                ),
+                rx.checkbox(
+                    "Refresh stale fields only",
+                    checked=State.refresh_mode,
+                    on_change=State.set_refresh_mode,
+                    disabled=State.is_processing,
+                ),
                 rx.spacer(),
                 rx.button(
                     "Export CSV",
@@ -302,5 +361,12 @@ def index():
     )
 
 
-app = rx.App()
+async def metrics(request):
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+# Prometheus scrape endpoint served by the backend: GET /metrics
+metrics_api = Starlette(routes=[Route("/metrics", metrics)])
+
+app = rx.App(api_transformer=metrics_api)
 app.add_page(index, title="AI Lead Enrichment", image="zurich-logo-update.png")
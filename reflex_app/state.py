@@ -3,222 +3,408 @@ import sys
 import reflex as rx
 import asyncio
 import csv
+from collections import deque
 from io import StringIO
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Deque, Optional, Tuple
 from dotenv import load_dotenv
-from tavily import TavilyClient
-from openai import AsyncAzureOpenAI
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from backend.researcher import ResearchPipeline
+from backend.clients import get_research_pipeline
+from backend.jobs import job_manager, job_store
+from backend.researcher import ENRICHMENT_SCHEMA, CompanyProfileState, EnrichmentField, ResearchPipeline, seed_refresh_state
 
 load_dotenv()
 
+# Refresh mode re-researches fields older than this or below this confidence
+REFRESH_MAX_AGE = float(os.getenv("REFRESH_MAX_AGE_DAYS", "30")) * 86400
+REFRESH_MIN_CONFIDENCE = os.getenv("REFRESH_MIN_CONFIDENCE", "Medium")
+# Rows rendered per table page; the full list stays on the server
+PAGE_SIZE = 50
+# Log lines kept on the server (oldest dropped first) and shown in the sidebar
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", "5000"))
+LOG_VIEW_LIMIT = 500
+
+
+def _empty_company() -> Dict[str, str]:
+    return {
+        "Nama Perusahaan": "",
+        "Sektor Perusahaan": "",
+        "Alamat": "",
+        "Kontak": "",
+        "Potensi Polis": "",
+        "Jumlah Karyawan": "",
+        "Short Description": "",
+        "Kantor Cabang": "",
+        "PIC Perusahaan": "",
+        "Laporan Keuangan": "",
+    }
+
 
 def _default_companies() -> List[Dict[str, str]]:
-    return [
-        {
-            "Nama Perusahaan": "",
-            "Sektor Perusahaan": "",
-            "Alamat": "",
-            "Kontak": "",
-            "Potensi Polis": "",
-            "Jumlah Karyawan": "",
-            "Short Description": "",
-            "Kantor Cabang": "",
-            "PIC Perusahaan": "",
-            "Laporan Keuangan": "",
-        }
-        for _ in range(5)
-    ]
+    return [_empty_company() for _ in range(5)]
+
+
+def _profile_from_row(company_name: str, row: Dict[str, str]) -> CompanyProfileState:
+    """Profile for a row filled outside this app (no stored timestamps, so every value counts as stale)."""
+    fields = {k: EnrichmentField() for k in ENRICHMENT_SCHEMA}
+    for name in ENRICHMENT_SCHEMA:
+        value = row.get(name)
+        if isinstance(value, str) and value.strip():
+            fields[name] = EnrichmentField(value=value, confidence="Medium")
+    return CompanyProfileState(company_name=company_name, fields=fields)
 
 
 class State(rx.State):
 
-    companies: List[Dict[str, str]] = _default_companies()
+    # All rows live in a backend var; only the visible page is sent to the browser
+    _companies: List[Dict[str, str]] = _default_companies()
+    page_rows: List[Dict[str, str]] = _default_companies()
+    page: int = 0
+    total_rows: int = 5
    
     # UI State
     is_processing: bool = False
     progress: int = 0
     status_log: str = ""
     sidebar_open: bool = True
-    research_logs: List[str] = []
+    # Ring buffer of (message, lowercased message); lowercasing once keeps log search incremental
+    _log_entries: Deque[Tuple[str, str]] = deque(maxlen=LOG_BUFFER_SIZE)
+    _pending_logs: List[str] = []
+    _batch_logs: bool = False
+    filtered_research_logs: List[str] = []
     log_query: str = ""
+    job_id: str = ""
+    _job_cursor: int = 0
+    refresh_mode: bool = False
    
     def toggle_sidebar(self):
         self.sidebar_open = not self.sidebar_open
    
     def add_row(self):
-        self.companies = self.companies + [{
-            "Nama Perusahaan": "", "Sektor Perusahaan": "", "Alamat": "", "Kontak": "",
-            "Potensi Polis": "", "Jumlah Karyawan": "", "Short Description": "",
-            "Kantor Cabang": "", "PIC Perusahaan": "", "Laporan Keuangan": ""
-        }]
+        self._companies.append(_empty_company())
+        # Jump to the page holding the new row
+        self.page = (len(self._companies) - 1) // PAGE_SIZE
+        self._load_page()
 
     def update_company_name(self, value: str, index: int):
-        new_companies = list(self.companies)
-        new_companies[index] = {**new_companies[index], "Nama Perusahaan": value}
-        self.companies = new_companies
+        """`index` is the row's position on the current page."""
+        self._update_row(self.page * PAGE_SIZE + index, {"Nama Perusahaan": value})
+
+    @rx.var
+    def page_count(self) -> int:
+        return max(1, (self.total_rows + PAGE_SIZE - 1) // PAGE_SIZE)
+
+    @rx.var
+    def page_label(self) -> str:
+        if not self.total_rows:
+            return "No rows"
+        start = self.page * PAGE_SIZE
+        return f"Rows {start + 1}-{min(start + PAGE_SIZE, self.total_rows)} of {self.total_rows} (page {self.page + 1} of {self.page_count})"
+
+    def next_page(self):
+        if (self.page + 1) * PAGE_SIZE < len(self._companies):
+            self.page += 1
+            self._load_page()
+
+    def prev_page(self):
+        if self.page > 0:
+            self.page -= 1
+            self._load_page()
+
+    def _load_page(self):
+        start = self.page * PAGE_SIZE
+        self.page_rows = [dict(row) for row in self._companies[start:start + PAGE_SIZE]]
+        self.total_rows = len(self._companies)
+
+    def _set_rows(self, rows: List[Dict[str, str]]):
+        self._companies = rows
+        self.page = min(self.page, max(0, (len(rows) - 1) // PAGE_SIZE))
+        self._load_page()
+
+    def _update_row(self, index: int, changes: Dict[str, Any]):
+        """Change one row; the browser only gets the current page, and only if the row is on it."""
+        if not 0 <= index < len(self._companies):
+            return
+        row = {**self._companies[index], **changes}
+        self._companies[index] = row
+        offset = index - self.page * PAGE_SIZE
+        if 0 <= offset < len(self.page_rows):
+            self.page_rows[offset] = dict(row)
+
+    def set_refresh_mode(self, value: bool):
+        self.refresh_mode = value
 
     def set_log_query(self, value: str):
         self.log_query = value
+        self._filter_logs()
 
     def append_log(self, message: str):
-        self.research_logs = self.research_logs + [message]
+        """Queue a log line; inside watch_job lines are flushed once per poll instead of one by one."""
+        self._pending_logs.append(message)
+        if not self._batch_logs:
+            self._flush_logs()
+
+    def _flush_logs(self):
+        if not self._pending_logs:
+            return
+        query = self.log_query.strip().lower()
+        matches = []
+        for message in self._pending_logs:
+            lowered = message.lower()
+            self._log_entries.append((message, lowered))
+            if query in lowered:
+                matches.append(message)
+        self._pending_logs = []
+        if matches:
+            self.filtered_research_logs = (self.filtered_research_logs + matches)[-LOG_VIEW_LIMIT:]
+
+    def _filter_logs(self):
+        query = self.log_query.strip().lower()
+        matches = [message for message, lowered in self._log_entries if query in lowered]
+        self.filtered_research_logs = matches[-LOG_VIEW_LIMIT:]
 
     def clear_search(self):
         self.log_query = ""
+        self._filter_logs()
 
     def reset_session_state(self):
         if self.is_processing:
             return
         self.log_query = ""
-        self.research_logs = []
+        self._log_entries.clear()
+        self._pending_logs = []
+        self.filtered_research_logs = []
         self.progress = 0
         self.status_log = ""
         self.is_processing = False
-        self.companies = _default_companies()
-
-    @rx.var
-    def filtered_research_logs(self) -> List[str]:
-        query = self.log_query.strip().lower()
-        if not query:
-            return self.research_logs
-        return [entry for entry in self.research_logs if query in entry.lower()]
+        self.job_id = ""
+        self.page = 0
+        self._set_rows(_default_companies())
 
     async def run_enrichment(self):
         # Filter companies that have names
-        targets = [(i, c["Nama Perusahaan"]) for i, c in enumerate(self.companies) if c["Nama Perusahaan"].strip()]
+        targets = [(i, c["Nama Perusahaan"]) for i, c in enumerate(self._companies) if c["Nama Perusahaan"].strip()]
        
         if not targets:
             self.status_log = "Please enter at least one company name."
             self.append_log(self.status_log)
             return
 
+        # Fail before creating the job, so a setup error (e.g. a missing API key) leaves no empty job behind
+        pipeline = self._build_pipeline()
+        if pipeline is None:
+            return
+
         self.is_processing = True
         self.progress = 0
         self.status_log = f"Starting enrichment for {len(targets)} companies..."
         self.append_log(self.status_log)
         yield
 
-        try:
-            tavily_api_key = os.getenv("TAVILY_API_KEY")
-            azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-            azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-            deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-            api_version = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
-
-            if not all([tavily_api_key, azure_api_key, azure_endpoint, deployment]):
-                self.status_log = "Error: Missing environment variables."
-                self.append_log(self.status_log)
-                self.is_processing = False
-                yield
-                return
-
-            tavily_client = TavilyClient(api_key=str(tavily_api_key))
-            azure_client = AsyncAzureOpenAI(
-                api_key=str(azure_api_key),
-                api_version=api_version,
-                azure_endpoint=str(azure_endpoint)
-            )
-           
-            pipeline = ResearchPipeline(tavily_client, azure_client, str(deployment))
+        pending = []
+        seeds = {}
+        for table_index, company_name in targets:
+            if self.refresh_mode:
+                # Only stale or low-confidence fields are researched again
+                previous = await asyncio.to_thread(job_store.get_profile, company_name) or _profile_from_row(
+                    company_name, self._companies[table_index]
+                )
+                seed, stale = seed_refresh_state(previous, REFRESH_MAX_AGE, REFRESH_MIN_CONFIDENCE)
+                self._apply_result(table_index, previous)
+                if not stale:
+                    self.append_log(f"Skipping {company_name} (all fields fresh)...")
+                    continue
+                self.append_log(f"Refreshing {company_name}: {', '.join(stale)}")
+                seeds[table_index] = seed
+                pending.append((table_index, company_name))
+                continue
+
+            # Check if already enriched (simple check: if Sektor Perusahaan is not empty)
+            sektor = self._companies[table_index].get("Sektor Perusahaan")
+            if sektor and isinstance(sektor, str) and sektor.strip():
+                self.append_log(f"Skipping {company_name} (already enriched)...")
+                continue
+            pending.append((table_index, company_name))
+
+        if not pending:
+            self.is_processing = False
+            self.progress = 100
+            self.status_log = "Nothing to enrich: all companies are already done."
+            self.append_log(self.status_log)
+            return
 
+        # Job store calls run in a worker thread so other sessions' events are not blocked
+        self.job_id = await asyncio.to_thread(job_store.create_job, pending, seeds)
+        self.append_log(f"Job {self.job_id} created ({len(pending)} companies).")
+        yield self._submit_job(pipeline, total=len(targets), finished=len(targets) - len(pending))
+
+    async def resume_enrichment(self):
+        """Continue the last unfinished job from its checkpoints, e.g. after a backend restart."""
+        job_id = self.job_id or await asyncio.to_thread(job_store.latest_unfinished_job)
+        job = await asyncio.to_thread(job_store.get_job, job_id) if job_id else None
+        if job is None or job["status"] == "done":
+            self.status_log = "No unfinished enrichment job to resume."
+            self.append_log(self.status_log)
+            return
+        if job_manager.is_active(job_id):
+            self.job_id = job_id
+            return State.watch_job
+
+        pipeline = self._build_pipeline()
+        if pipeline is None:
+            return
+
+        self.job_id = job_id
+        await asyncio.to_thread(job_store.retry_failed, job_id)
+        saved = await asyncio.to_thread(job_store.companies, job_id)
+        if not saved:
+            # e.g. left behind by an older version when submitting the job failed
+            await asyncio.to_thread(job_store.set_job_status, job_id, "failed")
+            self.status_log = f"Job {job_id} has no companies to resume."
+            self.append_log(self.status_log)
+            return
+
+        # Rebuild the table from the job so finished rows are not searched again
+        new_companies = list(self._companies)
+        while len(new_companies) <= max(c["position"] for c in saved):
+            new_companies.append(_empty_company())
+        for company in saved:
+            new_companies[company["position"]] = {**new_companies[company["position"]], "Nama Perusahaan": company["company_name"]}
+        self._set_rows(new_companies)
+        for company in saved:
+            if company["status"] == "done" and company["state"] is not None:
+                self._apply_result(company["position"], company["state"])
+
+        finished = sum(1 for c in saved if c["status"] == "done")
+        self.is_processing = True
+        self.status_log = f"Resuming job {job_id}: {finished}/{len(saved)} companies already done..."
+        self.append_log(self.status_log)
+        return self._submit_job(pipeline, total=len(saved), finished=finished)
+
+    def pause_enrichment(self):
+        if self.job_id and job_manager.is_active(self.job_id):
+            job_manager.pause(self.job_id)
+            self.status_log = "Pausing after the current search round..."
+            self.append_log(self.status_log)
+
+    def cancel_enrichment(self):
+        if self.job_id and job_manager.is_active(self.job_id):
+            job_manager.cancel(self.job_id)
+            self.status_log = "Cancelling enrichment..."
+            self.append_log(self.status_log)
+
+    def _build_pipeline(self) -> Optional[ResearchPipeline]:
+        """The shared research pipeline, or None (with the error logged) if the clients cannot be set up."""
+        try:
+            return get_research_pipeline()
         except Exception as e:
             self.status_log = f"Initialization Error: {str(e)}"
             self.append_log(self.status_log)
             self.is_processing = False
-            yield
-            return
+            return None
 
-        total = len(targets)
-        for idx, (table_index, company_name) in enumerate(targets):
-            # Check if already enriched (simple check: if Sektor Perusahaan is not empty)
-            current_row = self.companies[table_index]
-            sektor = current_row.get("Sektor Perusahaan")
-            if sektor and isinstance(sektor, str) and sektor.strip():
-                self.status_log = f"Skipping {company_name} (already enriched)..."
-                self.append_log(self.status_log)
-                self.progress = int((idx + 1) / total * 100)
-                yield
-                continue
+    def _submit_job(self, pipeline: ResearchPipeline, total: int, finished: int):
+        """Hand the job to the background JobManager and return the event that subscribes to it."""
+        self.progress = int(finished / total * 100) if total else 100
+        self._job_cursor = 0
+        try:
+            job_manager.submit(self.job_id, pipeline, total=total, finished=finished)
+        except Exception as e:
+            job_store.set_job_status(self.job_id, "failed")
+            self.status_log = f"Could not start job {self.job_id}: {str(e)}"
+            self.append_log(self.status_log)
+            self.is_processing = False
+            return None
+        return State.watch_job
+
+    @rx.event(background=True)
+    async def watch_job(self):
+        """Subscribe to the background job: apply new logs and finished rows until it stops."""
+        while True:
+            async with self:
+                progress = job_manager.status(self.job_id)
+                if progress is None:
+                    self.is_processing = False
+                    return
+                events, self._job_cursor = job_manager.events_since(self.job_id, self._job_cursor)
+                self._batch_logs = True
+                try:
+                    for event in events:
+                        self._handle_job_event(*event)
+                finally:
+                    self._batch_logs = False
+                    self._flush_logs()
+                if progress.total:
+                    self.progress = int(progress.finished / progress.total * 100)
+                if progress.status not in ("queued", "running"):
+                    self.status_log = {
+                        "paused": "Enrichment paused.",
+                        "cancelled": "Enrichment cancelled.",
+                    }.get(progress.status, "Enrichment Completed!")
+                    self.append_log(self.status_log)
+                    self.is_processing = False
+                    job_manager.forget(self.job_id)
+                    return
+            await asyncio.sleep(0.5)
 
-            self.status_log = f"Processing {idx + 1}/{total}: {company_name}..."
+    def _handle_job_event(self, event_type: str, table_index: int, company_name: str, payload: Any):
+        if event_type == "start":
+            self.status_log = f"Processing {company_name}..."
             self.append_log(self.status_log)
-            yield
-           
+        elif event_type == "log":
+            self.append_log(f"{company_name}: {payload}")
+        elif event_type == "field":
+            self._apply_field(table_index, *payload)
+        elif event_type == "paused":
+            self.append_log(f"Paused {company_name}.")
+        elif event_type == "result":
             try:
-                # Run research pipeline dengan streaming logs real-time
-                result_state = None
-                async for event_type, payload in pipeline.run_research_stream(company_name):
-                    if event_type == "log":
-                        # payload adalah string log message
-                        self.append_log(f"{company_name}: {payload}")
-                        yield
-                    elif event_type == "result":
-                        # payload adalah CompanyProfileState object
-                        result_state = payload
-
-                if result_state is None:
-                    raise ValueError("No result returned from research pipeline.")
-
-                # Ensure result_state is CompanyProfileState type
-                from backend.researcher import CompanyProfileState as CPState
-                if not isinstance(result_state, CPState):
-                    raise ValueError(f"Invalid result type: expected CompanyProfileState, got {type(result_state)}")
-
-                result_dict = result_state.to_dict()
-                fields = result_dict.get("fields", {})
-
-                # Update state - create new list to trigger reactivity
-                new_companies = list(self.companies)
-                updated_row = dict(new_companies[table_index])
-
-                mapping = {
-                    "Sektor Perusahaan": "Sektor Perusahaan",
-                    "Alamat": "Alamat",
-                    "Kontak": "Kontak",
-                    "Potensi Polis": "Potensi Polis",
-                    "Jumlah Karyawan": "Jumlah Karyawan",
-                    "Short Description": "Short Description",
-                    "Kantor Cabang": "Kantor Cabang",
-                    "PIC Perusahaan": "PIC Perusahaan",
-                    "Laporan Keuangan": "Laporan Keuangan"
-                }
-
-                for field_key, col_key in mapping.items():
-                    field_data = fields.get(field_key, {})
-                    updated_row[col_key] = field_data.get("value", "") if isinstance(field_data, dict) else ""
-               
-                new_companies[table_index] = updated_row
-                self.companies = new_companies
-               
+                self._apply_result(table_index, payload)
+                if payload.budget_exhausted:
+                    self.append_log(f"Completed {company_name} (budget exhausted: {payload.budget_exhausted}).")
+                else:
+                    self.append_log(f"Completed {company_name}.")
             except Exception as e:
-                self.status_log = f"Error processing {company_name}: {str(e)}"
-                self.append_log(self.status_log)
-                print(f"Error: {e}")
-           
-            # Update progress
-            self.progress = int((idx + 1) / total * 100)
-            if not self.status_log.startswith("Error processing"):
-                self.append_log(f"Completed {company_name}.")
-            yield
-
-        self.status_log = "Enrichment Completed!"
+                self._log_company_error(company_name, e)
+        else:
+            self._log_company_error(company_name, payload)
+
+    def _apply_result(self, table_index: int, result_state: Any):
+        if result_state is None:
+            raise ValueError("No result returned from research pipeline.")
+
+        # Ensure result_state is CompanyProfileState type
+        if not isinstance(result_state, CompanyProfileState):
+            raise ValueError(f"Invalid result type: expected CompanyProfileState, got {type(result_state)}")
+
+        fields = result_state.to_dict().get("fields", {})
+
+        changes = {}
+        for field_key in ENRICHMENT_SCHEMA:
+            field_data = fields.get(field_key, {})
+            changes[field_key] = field_data.get("value", "") if isinstance(field_data, dict) else ""
+        self._update_row(table_index, changes)
+
+    def _apply_field(self, table_index: int, field_name: str, value: Any, confidence: str):
+        """Fill a single cell as soon as the streamed extraction produces it."""
+        if field_name in ENRICHMENT_SCHEMA:
+            self._update_row(table_index, {field_name: value})
+
+    def _log_company_error(self, company_name: str, error: Exception):
+        self.status_log = f"Error processing {company_name}: {str(error)}"
         self.append_log(self.status_log)
-        self.is_processing = False
-        yield
+        print(f"Error: {error}")
 
     def export_csv(self):
         output = StringIO()
-        if not self.companies:
+        if not self._companies:
             return
        
-        fieldnames = list(self.companies[0].keys())
+        fieldnames = list(self._companies[0].keys())
         writer = csv.DictWriter(output, fieldnames=fieldnames)
        
         writer.writeheader()
-        writer.writerows(self.companies)
+        writer.writerows(self._companies)
        
         # Get CSV content
         csv_content = output.getvalue()
@@ -0,0 +1,72 @@
+import asyncio
+
+from backend.bench import FaultProfile, Fixtures, build_offline_pipeline
+from backend.researcher import new_profile
+
+
+def make_pipeline(answer):
+    pipeline = build_offline_pipeline(Fixtures(), FaultProfile(), FaultProfile(), "research", batch_size=3)
+    prompts = []
+
+    async def complete(prompt, parse, response_format=None):
+        prompts.append(prompt)
+        return answer(prompt)
+
+    pipeline.complete = complete
+    return pipeline, prompts
+
+
+def extract(pipeline, names):
+    states = [new_profile(name) for name in names]
+
+    async def run():
+        await asyncio.gather(*(
+            pipeline.extract_batched(state.company_name, f"{state.company_name} kantor di Jakarta", state.fields)
+            for state in states
+        ))
+
+    asyncio.run(run())
+    return states
+
+
+def test_concurrent_extractions_share_one_request():
+    found = {"Sektor Perusahaan": {"value": "Logistik", "confidence": "High"}}
+    pipeline, prompts = make_pipeline(lambda prompt: {name: found for name in ("PT A", "PT B", "PT C")})
+    states = extract(pipeline, ["PT A", "PT B", "PT C"])
+    assert len(prompts) == 1
+    assert all(state.fields["Sektor Perusahaan"].value == "Logistik" for state in states)
+
+
+def test_company_missing_from_the_batch_falls_back_to_its_own_call():
+    found = {"Sektor Perusahaan": {"value": "Logistik", "confidence": "High"}}
+    pipeline, prompts = make_pipeline(lambda prompt: {"PT A": found} if "### Company" in prompt else found)
+    states = extract(pipeline, ["PT A", "PT B"])
+    assert len(prompts) == 2
+    assert [state.fields["Sektor Perusahaan"].value for state in states] == ["Logistik", "Logistik"]
+
+
+def test_cancelled_wait_leaves_the_fields_alone():
+    found = {"Sektor Perusahaan": {"value": "Logistik", "confidence": "High"}}
+    pipeline, prompts = make_pipeline(lambda prompt: found)
+    pipeline.batch_window = 0.05
+    state = new_profile("PT A")
+
+    async def slow_complete(prompt, parse, response_format=None):
+        prompts.append(prompt)
+        await asyncio.sleep(0.2)
+        return found
+
+    pipeline.complete = slow_complete
+
+    async def run():
+        try:
+            async with asyncio.timeout(0.1):
+                await pipeline.extract_batched("PT A", "PT A kantor di Jakarta", state.fields)
+        except TimeoutError:
+            pass
+        # Let the request finish after the caller gave up
+        await asyncio.sleep(0.3)
+
+    asyncio.run(run())
+    assert len(prompts) == 1
+    assert state.fields["Sektor Perusahaan"].value == "Tidak Tersedia"
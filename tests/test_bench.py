@@ -0,0 +1,24 @@
+import pytest
+
+from backend.bench import percentile
+
+
+@pytest.mark.parametrize(
+    "n, pct, expected",
+    [
+        (2, 50, 1),
+        (6, 50, 3),
+        (10, 50, 5),
+        (10, 90, 9),
+        (10, 95, 10),
+        (4, 100, 4),
+        (4, 0, 1),
+        (5, 50, 3),
+    ],
+)
+def test_nearest_rank_percentile(n, pct, expected):
+    assert percentile([float(i) for i in range(n, 0, -1)], pct) == expected
+
+
+def test_empty_percentile_is_zero():
+    assert percentile([], 95) == 0.0
@@ -0,0 +1,23 @@
+import time
+
+from backend.budget import Budget, BudgetTracker, JobBudget
+
+
+def test_round_in_progress_counts_against_the_time_budget():
+    summary = {"stages": {"round": {"calls": 1, "seconds": 0.3}}}
+    tracker = BudgetTracker(summary, Budget(max_seconds=0.5))
+    assert tracker.exhausted() is None
+    tracker.start_round()
+    tracker.round_started -= 0.25  # the current round has run for 0.25s
+    assert tracker.seconds_left() < 0
+    assert tracker.exhausted().startswith("company budget")
+    assert tracker.end_round() >= 0.25
+    assert tracker.round_seconds() == 0.0
+
+
+def test_seconds_left_is_the_tighter_of_company_and_job():
+    job = JobBudget(Budget(max_seconds=10))
+    job.started = time.monotonic() - 9
+    tracker = BudgetTracker({}, Budget(max_seconds=5), job)
+    assert 0 < tracker.seconds_left() <= 1
+    assert BudgetTracker({}, Budget(max_tokens=100)).seconds_left() is None
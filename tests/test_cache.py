@@ -0,0 +1,61 @@
+import asyncio
+import sqlite3
+
+from backend.cache import PersistentCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return PersistentCache(str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def summed_bytes(cache):
+    return sqlite3.connect(cache.path).execute(f"SELECT COALESCE(SUM(size), 0) FROM {cache.table}").fetchone()[0]
+
+
+def test_running_total_follows_writes(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("a", "x" * 100)
+    cache.set("b", "y" * 50)
+    cache.set("a", "z" * 10)  # replacing an entry adjusts the total instead of adding to it
+    assert cache.stats()["bytes"] == summed_bytes(cache) == 12 + 52
+
+
+def test_existing_table_is_summed_on_open(tmp_path):
+    make_cache(tmp_path).set("a", "x" * 100)
+    conn = sqlite3.connect(str(tmp_path / "cache.sqlite3"))
+    conn.execute("DROP TABLE cache_sizes")
+    conn.commit()
+    assert make_cache(tmp_path).stats()["bytes"] == 102
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=1000)
+    for i in range(9):
+        cache.set(f"k{i}", "x" * 98)
+    cache.get("k0")
+    cache.set("k9", "x" * 98)
+    cache.set("k10", "x" * 98)
+    assert cache.get("k0") is not None
+    assert cache.get("k1") is None
+    assert cache.stats()["bytes"] == summed_bytes(cache) <= 1000
+
+
+def test_access_times_are_written_in_batches(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("a", 1)
+    stored = sqlite3.connect(cache.path).execute("SELECT last_access FROM cache").fetchone()[0]
+    cache.get("a")
+    conn = sqlite3.connect(cache.path)
+    assert conn.execute("SELECT last_access FROM cache").fetchone()[0] == stored
+    cache.flush()
+    assert conn.execute("SELECT last_access FROM cache").fetchone()[0] > stored
+
+
+def test_async_access(tmp_path):
+    cache = make_cache(tmp_path)
+
+    async def roundtrip():
+        await cache.aset("a", {"value": 1})
+        return await cache.aget("a")
+
+    assert asyncio.run(roundtrip()) == {"value": 1}
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend import clients
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch):
+    monkeypatch.setenv("TAVILY_API_KEY", "test")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test")
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com")
+    monkeypatch.setenv("AZURE_OPENAI_DEPLOYMENT_NAME", "test")
+    for registry in (clients._search_providers, clients._azure_clients, clients._pipelines):
+        registry.clear()
+
+
+def test_each_event_loop_gets_its_own_clients():
+    async def get():
+        return clients.get_research_pipeline(), clients.get_research_pipeline()
+
+    first, again = asyncio.run(get())
+    assert first is again
+    second, _ = asyncio.run(get())
+    assert second is not first
+    assert second.search_provider is not first.search_provider
+
+
+def test_closed_loops_are_pruned():
+    async def get():
+        clients.get_research_pipeline()
+        return [list(registry) for registry in (clients._search_providers, clients._azure_clients, clients._pipelines)]
+
+    for _ in range(3):
+        asyncio.run(get())
+    loop = asyncio.new_event_loop()
+    try:
+        keys = loop.run_until_complete(get())
+    finally:
+        loop.close()
+    assert keys == [[loop]] * 3
+
+
+def test_concurrent_callers_share_one_pipeline(monkeypatch):
+    built = []
+    build = clients.build_research_pipeline
+
+    def slow_build():
+        time.sleep(0.05)
+        built.append(build())
+        return built[-1]
+
+    monkeypatch.setattr(clients, "build_research_pipeline", slow_build)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(clients.get_research_pipeline())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 1
+    assert all(pipeline is built[0] for pipeline in results)
@@ -0,0 +1,47 @@
+import pytest
+
+from backend.derived import derive_potensi_polis
+from backend.researcher import EnrichmentField, apply_derived
+
+
+@pytest.mark.parametrize("sector, policies", [
+    ("Airlines", "PA, Travel"),
+    ("Hotels and Resorts", "PA, Travel"),
+    ("Tourism", "PA, Travel"),
+    ("Trucking transportation", "MV4, TPL, Cargo"),
+    ("Jasa Pengiriman Barang dan Logistik", "MV4, TPL, Cargo"),
+    ("Real Estate Properties", "Properti"),
+    ("Distribution of consumer goods", "Cargo"),
+])
+def test_plural_and_related_forms_match(sector, policies):
+    assert derive_potensi_polis({"Sektor Perusahaan": sector}) == policies
+
+
+@pytest.mark.parametrize("sector, policies", [
+    ("Information and Communication Technology", "PA, Properti"),
+    ("Perbankan", "PA, Properti"),
+    ("Retail", "Properti, Cargo"),
+    ("Rumah Sakit", "PA, Properti"),
+    ("F&B", "Properti, Cargo"),
+    ("Telekomunikasi", "PA, Properti"),
+    ("Asuransi", "PA, Properti"),
+    ("Pendidikan", "PA, Properti"),
+    ("E-commerce", "Properti, Cargo"),
+])
+def test_common_sectors_are_classified(sector, policies):
+    assert derive_potensi_polis({"Sektor Perusahaan": sector}) == policies
+
+
+def test_prefixes_do_not_match_unrelated_words():
+    assert derive_potensi_polis({"Short Description": "An important consulting firm"}) is None
+
+
+def test_unmatched_sector_stays_missing():
+    fields = {
+        "Sektor Perusahaan": EnrichmentField(),
+        "Short Description": EnrichmentField(),
+        "Potensi Polis": EnrichmentField(),
+    }
+    fields["Sektor Perusahaan"].update("Konsultan Pajak", "High")
+    assert apply_derived(fields) == []
+    assert fields["Potensi Polis"].value == "Tidak Tersedia"
@@ -0,0 +1,17 @@
+from backend.enrich import load_checkpoint
+
+
+def test_missing_output_is_no_checkpoint(tmp_path):
+    assert load_checkpoint(str(tmp_path / "enriched.csv")) == set()
+
+
+def test_empty_output_is_no_checkpoint(tmp_path):
+    output = tmp_path / "enriched.csv"
+    output.write_text("")
+    assert load_checkpoint(str(output)) == set()
+
+
+def test_written_rows_are_skipped(tmp_path):
+    output = tmp_path / "enriched.csv"
+    output.write_text("row,Nama Perusahaan\n0,PT A\n2,PT C\n")
+    assert load_checkpoint(str(output)) == {0, 2}
@@ -0,0 +1,27 @@
+from backend import graph
+from backend.search import SearchProvider
+
+
+class FakeSearch(SearchProvider):
+    async def search(self, query, **params):
+        return {"results": []}
+
+
+class FakeLLM(graph.LLMProvider):
+    async def generate(self, prompt):
+        return "{}"
+
+
+def test_pipelines_are_reused_per_client():
+    search, llm = FakeSearch(), FakeLLM()
+    assert graph.get_enrichment_pipeline(search, llm, None, None) is graph.get_enrichment_pipeline(search, llm, None, None)
+
+
+def test_only_recent_pipelines_are_kept(monkeypatch):
+    monkeypatch.setattr(graph, "_pipelines", graph.OrderedDict())
+    search, first = FakeSearch(), FakeLLM()
+    pipeline = graph.get_enrichment_pipeline(search, first, None, None)
+    for _ in range(graph.MAX_CACHED_PIPELINES):
+        graph.get_enrichment_pipeline(search, FakeLLM(), None, None)
+    assert len(graph._pipelines) == graph.MAX_CACHED_PIPELINES
+    assert graph.get_enrichment_pipeline(search, first, None, None) is not pipeline
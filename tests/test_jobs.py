@@ -0,0 +1,19 @@
+import asyncio
+
+from backend.bench import FaultProfile, Fixtures, build_offline_pipeline
+from backend.jobs import JobStore, run_job_stream
+
+
+def test_job_runs_to_done_with_checkpoints(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    pipeline = build_offline_pipeline(Fixtures(), FaultProfile(), FaultProfile(), "research")
+    job_id = store.create_job([(0, "PT Maju Jaya"), (1, "PT Sinar Abadi")])
+
+    async def run():
+        return [event async for event in run_job_stream(store, pipeline, job_id, max_global_rounds=1)]
+
+    events = asyncio.run(run())
+    assert sorted(event[1] for event in events if event[0] == "result") == [0, 1]
+    assert store.get_job(job_id)["status"] == "done"
+    assert {company["status"] for company in store.companies(job_id)} == {"done"}
+    assert store.get_profile("PT Maju Jaya").rounds_completed == 1
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from backend import metrics
+from backend.parsing import MalformedJSONError, ParseStats, parse_json_lenient, parse_members, repair_json
+from backend.researcher import EnrichmentField, apply_extraction
+
+
+def fields(*names):
+    return {name: EnrichmentField() for name in names}
+
+
+def test_clean_json_is_not_repaired():
+    stats = ParseStats()
+    assert parse_json_lenient('{"a": 1}', stats) == {"a": 1}
+    assert (stats.parsed, stats.repaired) == (1, 0)
+
+
+def test_fenced_json_with_trailing_comma():
+    stats = ParseStats()
+    assert parse_json_lenient('```json\n{"a": [1, 2,],}\n```', stats) == {"a": [1, 2]}
+    assert stats.repaired == 1
+
+
+def test_truncated_string_value_becomes_null():
+    text = '{"Alamat": {"value": "Jl. Sudirman No'
+    assert json.loads(repair_json(text)) == {"Alamat": {"value": None}}
+
+
+def test_truncated_array_item_is_dropped():
+    assert parse_json_lenient('{"queries": ["PT Foo alamat", "PT Foo kon') == {"queries": ["PT Foo alamat"]}
+
+
+def test_dangling_key_is_dropped():
+    assert json.loads(repair_json('{"A": 1, "Kont')) == {"A": 1}
+
+
+def test_key_without_value_becomes_null():
+    assert parse_json_lenient('{"A": {"value": "x", "confidence": "High"}, "Kontak": ') == {
+        "A": {"value": "x", "confidence": "High"},
+        "Kontak": None,
+    }
+
+
+def test_unrepairable_output_raises():
+    stats = ParseStats()
+    with pytest.raises(MalformedJSONError):
+        parse_json_lenient("not json at all", stats)
+    assert stats.failed == 1
+
+
+def test_parse_members_skips_unfinished_member():
+    members = parse_members('{"A": {"value": "x", "confidence": "High"}, "B": {"value": "y')
+    assert members == [("A", {"value": "x", "confidence": "High"})]
+
+
+def test_truncated_value_is_not_applied():
+    state = fields("Alamat")
+    extracted = parse_json_lenient('{"Alamat": {"value": "Jl. Sudirman No')
+    assert apply_extraction(extracted, state) == []
+    assert state["Alamat"].value == "Tidak Tersedia"
+
+
+def test_dangling_member_does_not_lose_the_others():
+    state = fields("Sektor Perusahaan", "Kontak")
+    extracted = parse_json_lenient('{"Sektor Perusahaan": {"value": "Logistik", "confidence": "High"}, "Kontak": ')
+    assert apply_extraction(extracted, state) == ["Sektor Perusahaan"]
+    assert state["Sektor Perusahaan"].value == "Logistik"
+    assert state["Kontak"].value == "Tidak Tersedia"
+
+
+@pytest.mark.parametrize("data", [
+    None,
+    "Logistik",
+    {"value": "Logistik"},
+    {"value": "Logistik", "confidence": None},
+    {"value": "Logistik", "confidence": "Sure"},
+    {"value": "  ", "confidence": "High"},
+    {"value": 42, "confidence": "High"},
+])
+def test_malformed_members_are_ignored(data):
+    state = fields("Sektor Perusahaan")
+    assert apply_extraction({"Sektor Perusahaan": data}, state) == []
+    assert state["Sektor Perusahaan"].value == "Tidak Tersedia"
+
+
+def test_not_found_answer_is_ignored():
+    state = fields("Kontak")
+    assert apply_extraction({"Kontak": {"value": "Tidak Tersedia", "confidence": "Low"}}, state) == []
+
+
+def test_non_object_extraction_is_ignored():
+    assert apply_extraction(["Logistik"], fields("Sektor Perusahaan")) == []
+
+
+def test_parse_outcomes_reach_the_metrics_registry():
+    metrics.registry.reset()
+    stats = ParseStats()
+    parse_json_lenient('{"a": 1}', stats)
+    parse_json_lenient('{"a": 1,', stats)
+    with pytest.raises(MalformedJSONError):
+        parse_json_lenient("not json at all", stats)
+    rendered = metrics.render_prometheus()
+    for outcome in ("parsed", "repaired", "failed"):
+        assert f'enrichment_llm_json_total{{outcome="{outcome}"}} 1' in rendered
@@ -0,0 +1,24 @@
+import pytest
+
+from backend.researcher import parse_grouped_queries
+
+GROUPS = {"kontak": ["Alamat", "Kontak"], "laporan": ["Jumlah Karyawan"]}
+
+
+def test_one_answer_covers_every_group():
+    data = {"kontak": ["PT A alamat kantor pusat"], "laporan": ["PT A jumlah karyawan", "PT A annual report"]}
+    assert parse_grouped_queries(data, "PT A", GROUPS) == data
+
+
+def test_missing_group_gets_templated_queries():
+    parsed = parse_grouped_queries({"kontak": ["PT A contact us"]}, "PT A", GROUPS)
+    assert parsed["laporan"] == ["PT A Jumlah Karyawan"]
+
+
+def test_plain_query_list_for_a_single_group():
+    assert parse_grouped_queries({"queries": ["q1"]}, "PT A", {"profil": ["Sektor Perusahaan"]}) == {"profil": ["q1"]}
+
+
+def test_answer_without_any_group_is_rejected():
+    with pytest.raises(ValueError):
+        parse_grouped_queries({"queries": ["q1"]}, "PT A", GROUPS)
@@ -0,0 +1,44 @@
+import time
+
+from backend.researcher import (
+    ENRICHMENT_SCHEMA, CompanyProfileState, EnrichmentField, apply_extraction, extraction_targets, new_profile,
+    seed_refresh_state,
+)
+from backend.scheduler import FieldScheduler
+
+ADDRESS = "Jl. Sudirman 1, Jakarta 12190"
+MONTH = 30 * 24 * 3600
+
+
+def stale_profile() -> CompanyProfileState:
+    previous = new_profile("PT Maju Jaya")
+    previous.fields["Alamat"] = EnrichmentField(ADDRESS, "High", "https://majujaya.co.id", updated_at=time.time() - 2 * MONTH)
+    return previous
+
+
+def test_stale_field_keeps_its_confidence_and_is_researched():
+    seed, stale = seed_refresh_state(stale_profile(), MONTH)
+    assert "Alamat" in stale
+    assert (seed.fields["Alamat"].value, seed.fields["Alamat"].confidence) == (ADDRESS, "High")
+    assert "Alamat" in extraction_targets(seed.fields)
+    assert "Alamat" in FieldScheduler(ENRICHMENT_SCHEMA).due_fields(seed.fields)
+
+
+def test_less_confident_answer_does_not_replace_a_stale_value():
+    seed, _ = seed_refresh_state(stale_profile(), MONTH)
+    assert apply_extraction({"Alamat": {"value": "Jakarta (mungkin)", "confidence": "Low"}}, seed.fields) == []
+    assert apply_extraction({"Alamat": {"value": "Jakarta", "confidence": "Medium"}}, seed.fields) == []
+    assert (seed.fields["Alamat"].value, seed.fields["Alamat"].confidence) == (ADDRESS, "High")
+
+
+def test_equally_confident_answer_refreshes_a_stale_value():
+    seed, _ = seed_refresh_state(stale_profile(), MONTH)
+    new_address = "Jl. Thamrin 2, Jakarta 10350"
+    assert apply_extraction({"Alamat": {"value": new_address, "confidence": "High"}}, seed.fields) == ["Alamat"]
+    assert seed.fields["Alamat"].value == new_address
+    assert not seed.fields["Alamat"].stale
+
+
+def test_stale_flag_survives_a_checkpoint():
+    seed, _ = seed_refresh_state(stale_profile(), MONTH)
+    assert CompanyProfileState.from_dict(seed.to_dict()).fields["Alamat"].stale
@@ -0,0 +1,93 @@
+from backend.researcher import EnrichmentField, ResearchPipeline, apply_extraction, extraction_targets
+from backend.rules import extract_with_rules, is_phone_number
+
+COMPANY = "PT Maju Jaya"
+
+
+def content(*texts):
+    return "\n\n".join(f"Source: https://majujaya.co.id/{i}\nContent: {text}" for i, text in enumerate(texts))
+
+
+def match(field, *texts):
+    found = extract_with_rules(COMPANY, content(*texts), [field])
+    return found[field].value if field in found else None
+
+
+def test_employee_count():
+    assert match("Jumlah Karyawan", "Maju Jaya mempekerjakan 1.500 karyawan.") == "1500"
+    assert match("Jumlah Karyawan", "Maju Jaya: 201-500 employees") == "201-500"
+
+
+def test_year_is_not_an_employee_count():
+    assert match("Jumlah Karyawan", "Maju Jaya merekrut 2024 karyawan baru tahun ini.") is None
+    assert match("Jumlah Karyawan", "Maju Jaya jumlah karyawan: 1998") is None
+
+
+def test_phone_numbers():
+    assert is_phone_number("(021) 5795 6789")
+    assert is_phone_number("+62 812-3456-7890")
+    assert is_phone_number("081234567890")
+
+
+def test_license_numbers_are_not_phone_numbers():
+    assert not is_phone_number("0212345678901")  # 13 digits is too long for a landline
+    assert not is_phone_number("0123456789")  # no area code starts with 1
+    assert not is_phone_number("62 0123 4567 890")
+    email = "Email: info@majujaya.co.id."
+    assert match("Kontak", f"Maju Jaya. {email} NIB 0812345678901") is None
+    assert match("Kontak", f"Maju Jaya. {email} Telp (021) 5795 6789") == "info@majujaya.co.id, (021) 5795 6789"
+
+
+def test_address_needs_city_or_postcode_context():
+    assert match(
+        "Alamat", "Maju Jaya kantor pusat: Jl. Sudirman Kav. 52, Senayan, Jakarta Selatan 12190."
+    ) == "Jl. Sudirman Kav. 52, Senayan, Jakarta Selatan 12190"
+    assert match(
+        "Alamat", "Maju Jaya, Jalan Asia Afrika No. 8, Kota Bandung, Jawa Barat 40111"
+    ) == "Jalan Asia Afrika No. 8, Kota Bandung, Jawa Barat 40111"
+    assert match("Alamat", "Maju Jaya, Jl. Raya Bogor Km 30 Kode Pos 16951") == "Jl. Raya Bogor Km 30 Kode Pos 16951"
+
+
+def test_any_five_digit_number_is_not_a_postcode():
+    assert match("Alamat", "Maju Jaya, Jalan ekspansi berlanjut, revenue naik 15000 persen") is None
+
+
+def test_rule_match_can_be_corrected_but_not_dropped():
+    fields = {"Jumlah Karyawan": EnrichmentField()}
+    fields["Jumlah Karyawan"].update("1500", "Medium", "rule")
+    # A Low answer keeps the rule match, a confident one replaces it
+    assert apply_extraction({"Jumlah Karyawan": {"value": "sekitar 1000", "confidence": "Low"}}, fields) == []
+    assert fields["Jumlah Karyawan"].value == "1500"
+    assert apply_extraction({"Jumlah Karyawan": {"value": "1200", "confidence": "High"}}, fields) == ["Jumlah Karyawan"]
+    assert fields["Jumlah Karyawan"].value == "1200"
+
+
+def test_rule_matches_are_rechecked_by_the_extraction():
+    fields = {"Jumlah Karyawan": EnrichmentField(), "Alamat": EnrichmentField()}
+    fields["Jumlah Karyawan"].update("1500", "Medium", "rule")
+    assert extraction_targets(fields) == ["Alamat"]
+    assert extraction_targets(fields, recheck=["Jumlah Karyawan"]) == ["Jumlah Karyawan", "Alamat"]
+
+
+def confidence(field, *texts):
+    return extract_with_rules(COMPANY, content(*texts), [field])[field].confidence
+
+
+def test_precise_matches_are_trusted_and_ambiguous_ones_rechecked():
+    assert confidence("Kontak", "Maju Jaya. Email: info@majujaya.co.id. Telp (021) 5795 6789") == "High"
+    assert confidence("Alamat", "Maju Jaya, Jalan Asia Afrika No. 8, Kota Bandung, Jawa Barat 40111") == "High"
+    assert confidence(
+        "Alamat",
+        "Maju Jaya cabang: Jl. Pemuda 10, Semarang 50132.",
+        "Maju Jaya cabang: Jl. Diponegoro 5, Surabaya 60241.",
+    ) == "Medium"
+    assert confidence("Jumlah Karyawan", "Maju Jaya mempekerjakan 1.500 karyawan.") == "Medium"
+
+
+def test_only_ambiguous_rule_matches_stay_in_the_prompt():
+    fields = {"Kontak": EnrichmentField(), "Jumlah Karyawan": EnrichmentField(), "Alamat": EnrichmentField()}
+    fields["Kontak"].update("info@majujaya.co.id, (021) 5795 6789", "High", "rule")
+    fields["Jumlah Karyawan"].update("1500", "Medium", "rule")
+    recheck = ResearchPipeline.rule_rechecks(["Kontak", "Jumlah Karyawan"], fields)
+    assert recheck == ["Jumlah Karyawan"]
+    assert extraction_targets(fields, recheck=recheck) == ["Jumlah Karyawan", "Alamat"]